@@ -1,141 +1,387 @@
 """AI engine for Tetris - heuristic-based decision making"""
 
 import numpy as np
-from typing import List, Tuple, Dict
-from game_engine import GameState, Piece, TETROMINOS, BOARD_WIDTH, BOARD_HEIGHT
-import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple, Dict, Optional
+from contour_index import ContourIndex
+from game_engine import (
+    GameState, Piece, PIECE_TYPES, PLACEMENT_TABLE, BOARD_WIDTH,
+    apply_placements, column_heights, column_masks, compute_features_batch,
+    landing_row, legal_placements, reachable_placements, weights_id
+)
+
+# 'drop' considers hard drops only, 'reachable' every resting position the
+# piece can reach by moving, soft dropping and rotating (tucks and spins)
+MOVE_GENERATORS = ('drop', 'reachable')
+
+# Score of a position where the piece cannot be placed
+GAME_OVER_SCORE = -9999.0
+
+
+class SearchTimeout(Exception):
+    """Raised inside the lookahead search when the time budget is spent"""
 
 
 class TetrisAI:
     """Heuristic-based Tetris AI"""
     
-    def __init__(self, weights: np.ndarray = None):
+    def __init__(self, weights: np.ndarray = None, cache_size: int = 1024, move_generator: str = 'drop'):
+        if move_generator not in MOVE_GENERATORS:
+            raise ValueError(f"Unknown move generator: {move_generator}")
+        self.move_generator = move_generator
         if weights is None:
             # Default trained weights
             self.weights = np.array([-0.510066, -0.76663, -0.384483, 1.860666])
         else:
             self.weights = np.array(weights, dtype=float)
+        
+        # LRU transposition cache of scored placements, 0 disables it
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        
+        # Per-thread count of placements scored, for request metrics
+        self._local = threading.local()
+        
+        # Precomputed greedy moves, used while built for the current weights
+        self.contour_index: Optional[ContourIndex] = None
+        self.contour_index_active = False
+        self.index_hits = 0
+    
+    def _count_placements(self, count: int):
+        self._local.placements = getattr(self._local, 'placements', 0) + count
+    
+    def take_placement_count(self) -> int:
+        """Placements scored by the calling thread since its last call"""
+        count = getattr(self._local, 'placements', 0)
+        self._local.placements = 0
+        return count
+    
+    def set_weights(self, weights: np.ndarray):
+        """Swap in new weights and drop cached results computed with the old ones"""
+        self.weights = np.array(weights, dtype=float)
+        self.clear_cache()
+        self.set_contour_index(self.contour_index)
+    
+    def set_contour_index(self, index: Optional[ContourIndex]):
+        """Use index for greedy moves when it was built for the current weights"""
+        self.contour_index = index
+        self.contour_index_active = (
+            index is not None and self.move_generator == 'drop'
+            and index.weights_id == weights_id(self.weights)
+        )
+    
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def cache_stats(self) -> Dict:
+        return {
+            'size': len(self._cache),
+            'max_size': self.cache_size,
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'evictions': self.cache_evictions,
+            'contour_index_hits': self.index_hits
+        }
+    
+    def _position_key(self, game: GameState, extra: bytes = b'') -> bytes:
+        """Compact hash of (board, piece type, weights) plus any search options"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.packbits(np.asarray(game.board) != 0).tobytes())
+        digest.update(game.current_piece.key.encode())
+        if self.move_generator == 'reachable':
+            # Reachable positions also depend on where the piece is now
+            piece = game.current_piece
+            digest.update(bytes([piece.rotation, piece.x % 256, piece.y % 256]))
+        digest.update(self.weights.tobytes())
+        digest.update(extra)
+        return digest.digest()
+    
+    def _cache_get(self, key: bytes):
+        with self._cache_lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.cache_misses += 1
+            else:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+            return value
+    
+    def _cache_put(self, key: bytes, value):
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.cache_evictions += 1
+    
+    def _placements(
+        self,
+        board: np.ndarray,
+        key: str,
+        heights: Optional[List[int]] = None,
+        start: Optional[Tuple[int, int, int]] = None
+    ) -> List[Tuple[int, int, int]]:
+        """(rotation, x, y) placements of a piece from the move generator"""
+        if self.move_generator == 'reachable':
+            return reachable_placements(column_masks(board), key, start)
+        return legal_placements(column_heights(board) if heights is None else heights, key)
+    
+    def _game_placements(self, game: GameState) -> List[Tuple[int, int, int]]:
+        piece = game.current_piece
+        return self._placements(game.board, piece.key, game.heights, (piece.rotation, piece.x, piece.y))
     
     def get_legal_actions(self, game: GameState) -> List[Tuple[int, int]]:
         """Get all legal (rotation, column) actions"""
-        actions = []
-        piece = game.current_piece
-        shapes = TETROMINOS[piece.key]
+        return list(dict.fromkeys(
+            (rotation, col) for rotation, col, _ in self._game_placements(game)
+        ))
+    
+    def _score(self, boards: np.ndarray, cleared: np.ndarray) -> np.ndarray:
+        """Weighted heuristic score of resulting boards"""
+        features = compute_features_batch(boards)
+        feature_matrix = np.column_stack([
+            features['aggregate_height'],
+            features['holes'],
+            features['bumpiness'],
+            cleared
+        ]).astype(float)
+        return feature_matrix @ self.weights
+    
+    def evaluate_placements(self, game: GameState) -> List[Dict]:
+        """Drop and score every legal action of the current piece once.
+
+        Each entry carries the rotation, column, landing row, score and lines
+        cleared, so callers never need to re-run the drop. Results are served
+        from the transposition cache when the position was seen before; the
+        returned list is shared with the cache and must not be modified.
+        """
+        if self.cache_size <= 0:
+            return self._search_placements(game)
+        
+        key = self._position_key(game)
+        placements = self._cache_get(key)
+        if placements is None:
+            placements = self._search_placements(game)
+            self._cache_put(key, placements)
+        return placements
+    
+    def _search_placements(self, game: GameState) -> List[Dict]:
+        key = game.current_piece.key
+        placements = self._game_placements(game)
+        if not placements:
+            return []
         
-        for rot_idx in range(len(shapes)):
-            shape = shapes[rot_idx]
-            width = len(shape[0])
-            
-            for col in range(BOARD_WIDTH - width + 1):
-                test_piece = Piece(piece.key, rot_idx, col, 0)
-                if game.is_valid_position(test_piece):
-                    actions.append((rot_idx, col))
+        boards, cleared = apply_placements(game.board, key, placements)
+        scores = self._score(boards, cleared)
+        self._count_placements(len(placements))
         
-        return actions
+        return [
+            {
+                'rotation': rotation,
+                'column': col,
+                'final_y': y,
+                'score': float(score),
+                'lines_cleared': int(lines)
+            }
+            for (rotation, col, y), score, lines in zip(placements, scores, cleared)
+        ]
+    
+    def evaluate_actions(self, game: GameState, actions: List[Tuple[int, int]]) -> np.ndarray:
+        """Evaluate a list of actions with one batched feature computation"""
+        key = game.current_piece.key
+        board = game.board
+        heights = game.heights
+        table = PLACEMENT_TABLE[key]
+        
+        valid_placements = []
+        valid = np.zeros(len(actions), dtype=bool)
+        for i, (rotation, col) in enumerate(actions):
+            info = table[rotation]
+            if col < 0 or col + info.width > BOARD_WIDTH:
+                continue
+            y = landing_row(heights, info, col)
+            if y >= 0:
+                valid_placements.append((rotation, col, y))
+                valid[i] = True
+        
+        scores = np.full(len(actions), GAME_OVER_SCORE)
+        if valid_placements:
+            boards, cleared = apply_placements(board, key, valid_placements)
+            scores[valid] = self._score(boards, cleared)
+            self._count_placements(len(valid_placements))
+        return scores
     
     def evaluate_action(self, game: GameState, action: Tuple[int, int]) -> float:
         """Evaluate an action by simulating placement"""
-        rotation, col = action
+        return float(self.evaluate_actions(game, [action])[0])
+    
+    def _with_piece(self, game: GameState, move: Dict) -> Dict:
+        """Attach the placed piece payload to a scored placement"""
+        piece = Piece.at(game.current_piece.key, move['rotation'], move['column'], move['final_y'])
+        return {
+            'rotation': move['rotation'],
+            'column': move['column'],
+            'final_y': move['final_y'],
+            'score': move['score'],
+            'depth': move.get('depth', 1),
+            'piece': piece.to_dict()
+        }
+    
+    def _lookahead(
+        self,
+        board: np.ndarray,
+        key: Optional[str],
+        depth: int,
+        beam_width: int,
+        deadline: Optional[float],
+        cleared: int
+    ) -> float:
+        """Best score reachable by placing `key` and depth - 1 further pieces.
+
+        An unknown piece (None) is averaged over all piece types. Only the
+        beam_width best placements of each ply are expanded further.
+        """
+        if key is None:
+            return float(np.mean([
+                self._lookahead(board, piece_type, depth, beam_width, deadline, cleared)
+                for piece_type in PIECE_TYPES
+            ]))
         
-        # Create test piece
-        piece = Piece(game.current_piece.key, rotation, col, 0)
+        if deadline is not None and time.perf_counter() > deadline:
+            raise SearchTimeout()
         
-        # Drop to final position
-        while game.is_valid_position(piece.move(0, 1)):
-            piece = piece.move(0, 1)
+        placements = self._placements(board, key)
+        if not placements:
+            return GAME_OVER_SCORE
         
-        if not game.is_valid_position(piece):
-            return -9999
+        boards, lines = apply_placements(board, key, placements)
+        total_lines = lines + cleared
+        scores = self._score(boards, total_lines)
+        self._count_placements(len(placements))
+        if depth <= 1:
+            return float(scores.max())
         
-        # Simulate placement
-        temp_board = game.board.copy()
-        for r, row in enumerate(piece.shape):
-            for c, cell in enumerate(row):
-                if cell:
-                    temp_board[piece.y + r, piece.x + c] = 1
+        best = np.argsort(-scores, kind='stable')[:beam_width]
+        return max(
+            self._lookahead(boards[i], None, depth - 1, beam_width, deadline, total_lines[i])
+            for i in best
+        )
+    
+    def rank_placements(
+        self,
+        game: GameState,
+        depth: int = 1,
+        beam_width: int = 5,
+        time_budget_ms: Optional[float] = None
+    ) -> List[Dict]:
+        """Placements of the current piece, best first.
+
+        With depth > 1 the beam_width best first placements are re-scored by
+        searching the known next piece (and unknown pieces after it). When the
+        time budget runs out, candidates searched so far are ranked first and
+        the rest keep their one-ply order.
+        """
+        placements = sorted(self.evaluate_placements(game), key=lambda p: p['score'], reverse=True)
+        if depth <= 1 or not placements:
+            return placements
         
-        # Count cleared lines
-        cleared = sum(1 for row in temp_board if all(row))
+        use_cache = self.cache_size > 0
+        if use_cache:
+            options = f"{game.next_piece_type}:{depth}:{beam_width}".encode()
+            cache_key = self._position_key(game, options)
+            ranked = self._cache_get(cache_key)
+            if ranked is not None:
+                return ranked
         
-        # Remove cleared lines
-        new_board = [row for row in temp_board if not all(row)]
-        while len(new_board) < len(temp_board):
-            new_board.insert(0, np.zeros(len(temp_board[0]), dtype=int))
-        temp_board = np.array(new_board)
+        deadline = None
+        if time_budget_ms is not None:
+            deadline = time.perf_counter() + time_budget_ms / 1000
         
-        # Calculate features
-        game_copy = copy.deepcopy(game)
-        game_copy.board = temp_board
-        features = game_copy.get_features()
+        key = game.current_piece.key
+        candidates = placements[:beam_width]
+        boards, _ = apply_placements(
+            game.board, key,
+            [(p['rotation'], p['column'], p['final_y']) for p in candidates]
+        )
         
-        # Calculate score
-        feature_vector = np.array([
-            features['aggregate_height'],
-            features['holes'],
-            features['bumpiness'],
-            cleared
-        ], dtype=float)
+        expanded = []
+        for placement, board in zip(candidates, boards):
+            try:
+                value = self._lookahead(
+                    board, game.next_piece_type, depth - 1,
+                    beam_width, deadline, placement['lines_cleared']
+                )
+            except SearchTimeout:
+                break
+            expanded.append({**placement, 'score': value, 'depth': depth})
         
-        score = np.dot(self.weights, feature_vector)
-        return score
+        expanded.sort(key=lambda p: p['score'], reverse=True)
+        ranked = expanded + placements[len(expanded):]
+        
+        # Partial results depend on timing, only complete searches are cached
+        if use_cache and len(expanded) == len(candidates):
+            self._cache_put(cache_key, ranked)
+        return ranked
     
-    def get_best_move(self, game: GameState) -> Dict:
+    def get_best_move(
+        self,
+        game: GameState,
+        depth: int = 1,
+        beam_width: int = 5,
+        time_budget_ms: Optional[float] = None
+    ) -> Dict:
         """Find best move for current game state"""
-        legal_actions = self.get_legal_actions(game)
+        if depth <= 1:
+            move = self._index_move(game)
+            if move is not None:
+                return move
+            placements = self.evaluate_placements(game)
+            if not placements:
+                return None
+            return self._with_piece(game, max(placements, key=lambda p: p['score']))
         
-        if not legal_actions:
+        ranked = self.rank_placements(game, depth, beam_width, time_budget_ms)
+        if not ranked:
             return None
-        
-        best_score = -float('inf')
-        best_action = None
-        
-        for action in legal_actions:
-            score = self.evaluate_action(game, action)
-            if score > best_score:
-                best_score = score
-                best_action = action
-        
-        if best_action is None:
+        return self._with_piece(game, ranked[0])
+    
+    def _index_move(self, game: GameState) -> Optional[Dict]:
+        """Greedy best move from the contour index, None when the index doesn't apply"""
+        if not self.contour_index_active:
             return None
-        
-        rotation, col = best_action
-        
-        # Calculate final position
-        piece = Piece(game.current_piece.key, rotation, col, 0)
-        while game.is_valid_position(piece.move(0, 1)):
-            piece = piece.move(0, 1)
-        
-        return {
-            'rotation': rotation,
-            'column': col,
-            'final_y': piece.y,
-            'score': float(best_score),
-            'piece': piece.to_dict()
-        }
+        found = self.contour_index.lookup(game)
+        if found is None:
+            return None
+        rotation, col = found
+        key = game.current_piece.key
+        y = landing_row(game.heights, PLACEMENT_TABLE[key][rotation], col)
+        features = game.placement_features(Piece.at(key, rotation, col, y))
+        score = self.weights @ [
+            features['aggregate_height'], features['holes'],
+            features['bumpiness'], features['lines_cleared']
+        ]
+        self._count_placements(1)
+        self.index_hits += 1
+        return self._with_piece(
+            game, {'rotation': rotation, 'column': col, 'final_y': y, 'score': float(score)}
+        )
     
-    def get_all_suggestions(self, game: GameState, top_k: int = 3) -> List[Dict]:
+    def get_all_suggestions(
+        self,
+        game: GameState,
+        top_k: int = 3,
+        depth: int = 1,
+        beam_width: int = 5,
+        time_budget_ms: Optional[float] = None
+    ) -> List[Dict]:
         """Get top-k best moves with scores"""
-        legal_actions = self.get_legal_actions(game)
-        
-        if not legal_actions:
-            return []
-        
-        scored_actions = []
-        for action in legal_actions:
-            score = self.evaluate_action(game, action)
-            rotation, col = action
-            
-            piece = Piece(game.current_piece.key, rotation, col, 0)
-            while game.is_valid_position(piece.move(0, 1)):
-                piece = piece.move(0, 1)
-            
-            scored_actions.append({
-                'rotation': rotation,
-                'column': col,
-                'final_y': piece.y,
-                'score': float(score),
-                'piece': piece.to_dict()
-            })
-        
-        scored_actions.sort(key=lambda x: x['score'], reverse=True)
-        return scored_actions[:top_k]
\ No newline at end of file
+        ranked = self.rank_placements(game, depth, beam_width, time_budget_ms)
+        return [self._with_piece(game, p) for p in ranked[:top_k]]
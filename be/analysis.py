@@ -0,0 +1,163 @@
+"""Bulk AI analysis of recorded positions, spread over worker processes.
+
+Input is either NDJSON, one position per line in the same shape as an
+/ai-move message (``"piece": "T"`` is accepted instead of ``current_piece``,
+and an optional ``"id"`` is echoed back), or back-to-back binary requests of
+the websocket protocol (``protocol.REQUEST``). Positions are read in
+batches and at most ``max_in_flight`` batches are queued on the workers, so
+memory stays bounded however large the input is. Results are NDJSON lines,
+yielded per batch as batches finish:
+
+    {"index": 0, "id": ..., "best_move": {...}, "top": [{...}, ...]}
+    {"index": 1, "error": "..."}
+"""
+
+import asyncio
+import functools
+import json
+from concurrent.futures import Executor
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+import protocol
+from ai_engine import TetrisAI
+
+BATCH_SIZE = 256
+MAX_BATCH_SIZE = 4096
+MAX_IN_FLIGHT = 8
+
+# Per-process AI, created by the first batch a worker runs
+_worker_ai: Optional[TetrisAI] = None
+
+
+class RecordSplitter:
+    """Split a byte stream into NDJSON lines or fixed-size binary records"""
+
+    def __init__(self, binary: bool):
+        self.record_size = protocol.REQUEST.size if binary else None
+        self._buffer = b''
+
+    def feed(self, data: bytes) -> List[bytes]:
+        buffer = self._buffer + data
+        if self.record_size is None:
+            *records, self._buffer = buffer.split(b'\n')
+            return [record for record in records if record.strip()]
+        end = len(buffer) - len(buffer) % self.record_size
+        self._buffer = buffer[end:]
+        return [buffer[i:i + self.record_size] for i in range(0, end, self.record_size)]
+
+    def finish(self) -> List[bytes]:
+        """Records left at the end of the stream (a last line without newline)"""
+        rest, self._buffer = self._buffer, b''
+        if not rest.strip():
+            return []
+        if self.record_size is not None:
+            raise ValueError(f"Trailing {len(rest)} bytes are not a whole {self.record_size}-byte record")
+        return [rest]
+
+
+def _move(placement: Dict) -> Dict:
+    return {
+        'rotation': placement['rotation'],
+        'column': placement['column'],
+        'final_y': placement['final_y'],
+        'score': float(placement['score']),
+        'lines_cleared': int(placement['lines_cleared'])
+    }
+
+
+def analyze_batch(
+    weights: List[float],
+    start: int,
+    records: List[bytes],
+    binary: bool,
+    top_k: int = 3,
+    depth: int = 1,
+    beam_width: int = 5,
+    time_budget_ms: Optional[float] = None
+) -> bytes:
+    """Worker side: analyze a batch of raw records into NDJSON result lines"""
+    global _worker_ai
+    if _worker_ai is None:
+        _worker_ai = TetrisAI(weights)
+    elif not np.array_equal(_worker_ai.weights, weights):
+        _worker_ai.set_weights(weights)
+
+    lines = []
+    for index, record in enumerate(records, start):
+        result = {'index': index}
+        try:
+            data = protocol.decode_request(record) if binary else json.loads(record)
+            if 'id' in data:
+                result['id'] = data['id']
+            ranked = _worker_ai.rank_placements(protocol.parse_game(data), depth, beam_width, time_budget_ms)
+            result['best_move'] = _move(ranked[0]) if ranked else None
+            result['top'] = [_move(p) for p in ranked[:top_k]]
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        lines.append(json.dumps(result))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+async def analyze_stream_async(
+    chunks: AsyncIterator[bytes],
+    executor: Executor,
+    weights: List[float],
+    binary: bool = False,
+    batch_size: int = BATCH_SIZE,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    **options
+) -> AsyncIterator[bytes]:
+    """Analyze positions read from an async byte stream, yield NDJSON result batches"""
+    loop = asyncio.get_running_loop()
+    splitter = RecordSplitter(binary)
+    pending = set()
+    batch: List[bytes] = []
+    start = 0
+
+    def submit():
+        nonlocal batch, start
+        pending.add(loop.run_in_executor(
+            executor, functools.partial(analyze_batch, weights, start, batch, binary, **options)
+        ))
+        start += len(batch)
+        batch = []
+
+    async for data in chunks:
+        for record in splitter.feed(data):
+            batch.append(record)
+            if len(batch) == batch_size:
+                submit()
+                # Stop reading input until a batch slot is free
+                while len(pending) >= max_in_flight:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+    batch.extend(splitter.finish())
+    if batch:
+        submit()
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+async def _async_chunks(chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+    for data in chunks:
+        yield data
+
+
+def analyze_stream(chunks: Iterable[bytes], executor: Executor, weights: List[float], **options) -> Iterator[bytes]:
+    """analyze_stream_async for a blocking byte stream such as a file, run on its own event loop"""
+    loop = asyncio.new_event_loop()
+    results = analyze_stream_async(_async_chunks(chunks), executor, weights, **options)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
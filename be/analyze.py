@@ -0,0 +1,65 @@
+"""Analyze a file of recorded positions with the AI, writing NDJSON results.
+
+    python analyze.py positions.ndjson -o results.ndjson
+    python analyze.py positions.bin --binary --depth 2 --workers 8
+    cat positions.ndjson | python analyze.py - > results.ndjson
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ai_engine import TetrisAI
+from analysis import BATCH_SIZE, MAX_IN_FLIGHT, analyze_stream
+
+READ_SIZE = 1 << 16
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk Tetris AI position analysis")
+    parser.add_argument('input', help="NDJSON or binary positions file, - for stdin")
+    parser.add_argument('-o', '--output', help="write results here instead of stdout")
+    parser.add_argument('--binary', action='store_true', help="input is binary websocket protocol requests")
+    parser.add_argument('--weights', default="best_weights.npy", help="weights .npy file (default AI weights if missing)")
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--beam-width', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if os.path.exists(args.weights):
+        weights = np.load(args.weights, allow_pickle=True).flatten()
+    else:
+        weights = TetrisAI().weights
+
+    source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    target = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = analyze_stream(
+                iter(lambda: source.read(READ_SIZE), b''),
+                executor,
+                weights.tolist(),
+                binary=args.binary,
+                batch_size=args.batch_size,
+                max_in_flight=max(MAX_IN_FLIGHT, 2 * args.workers),
+                top_k=args.top_k,
+                depth=args.depth,
+                beam_width=args.beam_width
+            )
+            for chunk in results:
+                target.write(chunk)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if target is not sys.stdout.buffer:
+            target.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Lockstep simulation of many Tetris games at once, used for training"""
+
+import numpy as np
+import random
+from typing import Dict, List, Optional
+from game_engine import (
+    BOARD_WIDTH, BOARD_HEIGHT, PIECE_TYPES, PLACEMENT_TABLE,
+    clear_full_rows, compute_features_batch
+)
+
+LINE_SCORES = np.array([0, 100, 300, 500, 800])
+
+
+class _PieceTable:
+    """Every hard-drop placement of one piece as flat arrays"""
+
+    def __init__(self, key: str):
+        rotations, xs, columns, bottoms, cell_rows, cell_cols = [], [], [], [], [], []
+        for rotation, info in enumerate(PLACEMENT_TABLE[key]):
+            for x in range(BOARD_WIDTH - info.width + 1):
+                rotations.append(rotation)
+                xs.append(x)
+                # Pad the per-column profile to 4 columns by repeating the first
+                # one, which leaves the minimum unchanged
+                cols = [x + c for c in range(info.width)]
+                bottom = list(info.bottom)
+                columns.append(cols + [cols[0]] * (4 - info.width))
+                bottoms.append(bottom + [bottom[0]] * (4 - info.width))
+                cell_rows.append([r for r, _ in info.cells])
+                cell_cols.append([x + c for _, c in info.cells])
+
+        self.rotations = np.array(rotations)
+        self.xs = np.array(xs)
+        self.columns = np.array(columns)
+        self.bottoms = np.array(bottoms)
+        self.cell_rows = np.array(cell_rows)
+        self.cell_cols = np.array(cell_cols)
+
+        spawn = PLACEMENT_TABLE[key][0]
+        spawn_x = BOARD_WIDTH // 2 - spawn.width // 2
+        self.spawn_rows = np.array([r for r, _ in spawn.cells])
+        self.spawn_cols = np.array([spawn_x + c for _, c in spawn.cells])
+
+
+PIECE_TABLES = {key: _PieceTable(key) for key in PIECE_TYPES}
+
+
+class BatchSimulator:
+    """Advances N games in lockstep with greedy heuristic play.
+
+    Boards live in one (N x height x width) array. Each step generates every
+    game's placements, scores them against that game's weight vector and
+    locks the best one, all with array operations grouped by piece type.
+    Piece sequences match GameState(seed) for the same seeds, so results
+    agree with playing the games one at a time through TetrisAI.
+    """
+
+    def __init__(self, seeds: List[int], weights: np.ndarray):
+        self.n = len(seeds)
+        weights = np.asarray(weights, dtype=float)
+        if weights.ndim == 1:
+            weights = np.tile(weights, (self.n, 1))
+        self.weights = weights
+
+        self.boards = np.zeros((self.n, BOARD_HEIGHT, BOARD_WIDTH), dtype=bool)
+        self.lines = np.zeros(self.n, dtype=int)
+        self.score = np.zeros(self.n, dtype=int)
+        self.moves = np.zeros(self.n, dtype=int)
+        self.game_over = np.zeros(self.n, dtype=bool)
+        # Set when a game stops because its piece has no legal placement
+        self.stuck = np.zeros(self.n, dtype=bool)
+
+        # Same draws as GameState: current piece first, then the next one
+        self.rngs = [random.Random(seed) for seed in seeds]
+        self.current = [rng.choice(PIECE_TYPES) for rng in self.rngs]
+        self.next = [rng.choice(PIECE_TYPES) for rng in self.rngs]
+
+    @property
+    def active(self) -> np.ndarray:
+        return ~(self.game_over | self.stuck)
+
+    def _heights(self, boards: np.ndarray) -> np.ndarray:
+        return np.where(boards.any(axis=1), BOARD_HEIGHT - np.argmax(boards, axis=1), 0)
+
+    def step(self, games: Optional[np.ndarray] = None):
+        """Place one piece in every given (default: every active) game"""
+        if games is None:
+            games = np.flatnonzero(self.active)
+
+        by_piece: Dict[str, List[int]] = {}
+        for g in games:
+            by_piece.setdefault(self.current[g], []).append(g)
+
+        for key, group in by_piece.items():
+            self._step_group(key, np.array(group))
+
+        self._spawn(games)
+
+    def _step_group(self, key: str, games: np.ndarray):
+        table = PIECE_TABLES[key]
+        count, placements = len(games), len(table.rotations)
+
+        # Landing rows from column heights, one per (game, placement)
+        heights = self._heights(self.boards[games])
+        landing = (BOARD_HEIGHT - 1 - heights[:, table.columns] - table.bottoms).min(axis=2)
+        valid = landing >= 0
+
+        # Lock every placement on a copy of its game's board
+        boards = np.repeat(self.boards[games][:, np.newaxis], placements, axis=1)
+        rows = np.maximum(landing, 0)[:, :, np.newaxis] + table.cell_rows
+        boards[
+            np.arange(count)[:, np.newaxis, np.newaxis],
+            np.arange(placements)[np.newaxis, :, np.newaxis],
+            rows,
+            table.cell_cols[np.newaxis]
+        ] = True
+
+        flat, cleared = clear_full_rows(boards.reshape(-1, BOARD_HEIGHT, BOARD_WIDTH))
+        features = compute_features_batch(flat)
+        feature_matrix = np.stack([
+            features['aggregate_height'],
+            features['holes'],
+            features['bumpiness'],
+            cleared
+        ], axis=1).astype(float).reshape(count, placements, 4)
+
+        scores = np.einsum('gpf,gf->gp', feature_matrix, self.weights[games])
+        scores[~valid] = -np.inf
+        best = np.argmax(scores, axis=1)
+
+        has_move = valid.any(axis=1)
+        self.stuck[games[~has_move]] = True
+
+        movers = np.flatnonzero(has_move)
+        chosen = movers * placements + best[movers]
+        games = games[movers]
+        lines = cleared[chosen]
+
+        level = self.lines[games] // 10 + 1
+        self.boards[games] = flat[chosen]
+        self.score[games] += LINE_SCORES[np.minimum(lines, 4)] * level
+        self.lines[games] += lines
+        self.moves[games] += 1
+
+    def _spawn(self, games: np.ndarray):
+        """Spawn the next piece in every game that moved and check for top-out"""
+        for g in games:
+            if self.stuck[g]:
+                continue
+            self.current[g] = self.next[g]
+            self.next[g] = self.rngs[g].choice(PIECE_TYPES)
+            table = PIECE_TABLES[self.current[g]]
+            if self.boards[g, table.spawn_rows, table.spawn_cols].any():
+                self.game_over[g] = True
+
+    def run(self, max_moves: int = 800) -> np.ndarray:
+        """Play until every game has ended or made max_moves moves, return lines"""
+        while True:
+            games = np.flatnonzero(self.active & (self.moves < max_moves))
+            if len(games) == 0:
+                break
+            self.step(games)
+        return self.lines
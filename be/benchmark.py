@@ -0,0 +1,244 @@
+"""Micro-benchmarks for the game engine, AI and trainer.
+
+Runs on fixed seeded boards and piece sequences, prints throughput per
+metric, optionally writes the results as JSON and fails (exit code 1) when a
+metric drops more than the allowed fraction below a stored baseline.
+Each metric is the median of several rounds, and metrics flagged as
+regressed are measured again before failing.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import platform
+import sys
+import statistics
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ai_engine import TetrisAI
+from game_engine import ENGINES, GameState, Piece, TETROMINOS
+from trainer import evaluate_weights
+
+SEED = 1234
+WEIGHTS = [-0.510066, -0.76663, -0.384483, 1.860666]
+
+
+def seeded_positions(count: int = 50, seed: int = SEED) -> List[Tuple[np.ndarray, str]]:
+    """Boards taken from seeded AI games at increasing move numbers"""
+    positions = []
+    ai = TetrisAI(WEIGHTS, cache_size=0)
+    game_seed = seed
+    while len(positions) < count:
+        game = GameState(seed=game_seed)
+        game_seed += 1
+        for move in range(200):
+            best = ai.get_best_move(game)
+            if not best or game.game_over:
+                break
+            if move % 10 == 5:
+                positions.append((game.board.copy(), game.current_piece.key))
+            game.lock_piece(Piece(game.current_piece.key, best['rotation'], best['column'], best['final_y']))
+    return positions[:count]
+
+
+def measure(func: Callable[[], int], min_time: float = 1.0, rounds: int = 7) -> float:
+    """Median operations/sec over several rounds; func returns the operations it ran"""
+    rates = []
+    for _ in range(rounds):
+        ops = 0
+        start = time.perf_counter()
+        while True:
+            ops += func()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rates.append(ops / elapsed)
+    return statistics.median(rates)
+
+
+def bench_is_valid_position(positions, engine: str) -> float:
+    games = []
+    for board, key in positions:
+        game = ENGINES[engine](seed=SEED)
+        game.board = board.copy()
+        pieces = [
+            Piece(key, rotation, x, y)
+            for rotation in range(len(TETROMINOS[key]))
+            for x in range(0, 8)
+            for y in range(0, 20, 3)
+        ]
+        games.append((game, pieces))
+
+    def run():
+        ops = 0
+        for game, pieces in games:
+            for piece in pieces:
+                game.is_valid_position(piece)
+            ops += len(pieces)
+        return ops
+    return measure(run)
+
+
+def bench_lock_piece(positions, engine: str) -> float:
+    ai = TetrisAI(WEIGHTS, cache_size=0)
+    moves = []
+    for board, key in positions:
+        game = ENGINES[engine](seed=SEED)
+        game.board = board.copy()
+        game.current_piece = Piece(key, 0, 0, 0)
+        best = ai.get_best_move(game)
+        if best:
+            moves.append((board, Piece(key, best['rotation'], best['column'], best['final_y'])))
+
+    def run():
+        for board, piece in moves:
+            game = ENGINES[engine](seed=SEED)
+            game.board = board.copy()
+            game.lock_piece(piece)
+        return len(moves)
+    return measure(run)
+
+
+def bench_clear_lines(engine: str) -> float:
+    rng = np.random.default_rng(SEED)
+    boards = []
+    for _ in range(20):
+        board = (rng.random((20, 10)) < 0.5).astype(int)
+        board[rng.choice(20, size=rng.integers(1, 5), replace=False)] = 1
+        boards.append(board)
+
+    def run():
+        for board in boards:
+            game = ENGINES[engine](seed=SEED)
+            game.board = board.copy()
+            game._clear_lines()
+        return len(boards)
+    return measure(run)
+
+
+def bench_get_features(positions) -> float:
+    game = GameState(seed=SEED)
+    boards = [board for board, _ in positions]
+
+    def run():
+        for board in boards:
+            game.get_features(board)
+        return len(boards)
+    return measure(run)
+
+
+def bench_get_best_move(positions, depth: int, move_generator: str = 'drop') -> float:
+    ai = TetrisAI(WEIGHTS, cache_size=0, move_generator=move_generator)
+    games = []
+    for board, key in positions:
+        game = GameState(seed=SEED)
+        game.board = board.copy()
+        game.current_piece = Piece(key, 0, 0, 0)
+        games.append(game)
+
+    def run():
+        for game in games:
+            ai.get_best_move(game, depth=depth)
+        return len(games)
+    return measure(run)
+
+
+def bench_evaluate_weights() -> float:
+    seeds = [SEED, SEED + 1]
+
+    def run():
+        evaluate_weights(WEIGHTS, max_moves=200, seeds=seeds)
+        return len(seeds)
+    return measure(run)
+
+
+def run_benchmarks(names: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Run all benchmarks, or only those in names"""
+    positions = seeded_positions()
+    benchmarks = {
+        'is_valid_position.array': (lambda: bench_is_valid_position(positions, 'array'), 'placements/sec'),
+        'is_valid_position.bitboard': (lambda: bench_is_valid_position(positions, 'bitboard'), 'placements/sec'),
+        'lock_piece.array': (lambda: bench_lock_piece(positions, 'array'), 'locks/sec'),
+        'lock_piece.bitboard': (lambda: bench_lock_piece(positions, 'bitboard'), 'locks/sec'),
+        'clear_lines.array': (lambda: bench_clear_lines('array'), 'boards/sec'),
+        'clear_lines.bitboard': (lambda: bench_clear_lines('bitboard'), 'boards/sec'),
+        'get_features': (lambda: bench_get_features(positions), 'boards/sec'),
+        'get_best_move.depth1': (lambda: bench_get_best_move(positions, 1), 'moves/sec'),
+        'get_best_move.depth2': (lambda: bench_get_best_move(positions, 2), 'moves/sec'),
+        'get_best_move.reachable': (lambda: bench_get_best_move(positions, 1, 'reachable'), 'moves/sec'),
+        'evaluate_weights': (bench_evaluate_weights, 'games/sec'),
+    }
+
+    results = {}
+    for name, (bench, unit) in benchmarks.items():
+        if names is not None and name not in names:
+            continue
+        value = bench()
+        results[name] = {'value': value, 'unit': unit}
+        print(f"{name:32s} {value:14.1f} {unit}")
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Names of metrics more than threshold (fraction) below their baseline"""
+    regressions = []
+    for name, base in baseline.items():
+        if name not in results:
+            continue
+        value, expected = results[name]['value'], base['value']
+        change = value / expected - 1
+        status = 'REGRESSION' if change < -threshold else 'ok'
+        print(f"{name:32s} {change:+7.1%} vs baseline  {status}")
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Tetris engine and AI benchmarks")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against this baseline JSON file")
+    parser.add_argument('--save-baseline', help="write results as the new baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed slowdown as a fraction of the baseline (default 0.2)")
+    args = parser.parse_args()
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'metrics': run_benchmarks()
+    }
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['metrics']
+        regressions = compare(report['metrics'], baseline, args.threshold)
+        if regressions:
+            # Re-measure before failing so one noisy run doesn't flag a regression
+            print(f"🔁 Re-measuring {len(regressions)} metric(s): {', '.join(regressions)}")
+            for name, result in run_benchmarks(regressions).items():
+                if result['value'] > report['metrics'][name]['value']:
+                    report['metrics'][name] = result
+            regressions = compare({name: report['metrics'][name] for name in regressions},
+                                  baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+            return 1
+        print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Throttled latest-state broadcast from a worker thread to asyncio listeners"""
+
+import asyncio
+import threading
+from typing import AsyncIterator, Dict, Optional
+
+
+class ProgressBroadcaster:
+    """Fan out the latest state of a long job to any number of listeners.
+
+    publish() may be called from any thread and only replaces a pending
+    state, so a burst of updates costs a dict copy each. At most one
+    snapshot per min_interval seconds is published on the event loop, and
+    publishing wakes every listener through one shared future instead of a
+    queue per listener. A final state is always published (after at most
+    min_interval) and ends every listener's stream.
+    """
+
+    def __init__(self, min_interval: float = 0.25):
+        self.min_interval = min_interval
+        self.listeners = 0
+        self._lock = threading.Lock()
+        self._pending: Optional[Dict] = None
+        self._pending_final = False
+        self._scheduled = False
+        # (version, state, final) of the last published snapshot
+        self._published = (0, {}, False)
+        self._last_flush = float('-inf')
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Future] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Attach to the event loop listeners run on"""
+        if self._loop is not None:
+            return
+        self._loop = loop
+        self._changed = loop.create_future()
+        with self._lock:
+            if self._pending is None or self._scheduled:
+                return
+            self._scheduled = True
+        loop.call_soon(self._schedule_flush)
+
+    def publish(self, state: Dict, final: bool = False):
+        """Replace the state listeners will see next (thread-safe)"""
+        with self._lock:
+            self._pending = dict(state)
+            self._pending_final = final
+            if self._loop is None or self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._schedule_flush)
+
+    def reset(self, state: Dict):
+        """Start a new run by publishing state right away (on the event loop)"""
+        self.bind(asyncio.get_running_loop())
+        with self._lock:
+            self._pending = None
+            self._pending_final = False
+        self._publish_now(dict(state), False)
+
+    def _schedule_flush(self):
+        delay = max(0.0, self._last_flush + self.min_interval - self._loop.time())
+        self._loop.call_later(delay, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            state, final = self._pending, self._pending_final
+            self._pending = None
+            self._scheduled = False
+        if state is not None:
+            self._publish_now(state, final)
+
+    def _publish_now(self, state: Dict, final: bool):
+        self._published = (self._published[0] + 1, state, final)
+        self._last_flush = self._loop.time()
+        changed, self._changed = self._changed, self._loop.create_future()
+        changed.set_result(None)
+
+    async def listen(self) -> AsyncIterator[Dict]:
+        """Current state right away, then every published one until the final state"""
+        self.bind(asyncio.get_running_loop())
+        self.listeners += 1
+        try:
+            seen = None
+            while True:
+                changed = self._changed
+                version, state, final = self._published
+                if version != seen:
+                    seen = version
+                    yield state
+                if final:
+                    return
+                # Shielded: a disconnecting listener must not cancel the shared future
+                await asyncio.shield(changed)
+        finally:
+            self.listeners -= 1
@@ -0,0 +1,302 @@
+"""Precomputed greedy moves keyed by the surface contour of the stack.
+
+The greedy (depth 1) hard-drop choice depends only on the differences
+between neighbouring column heights, as long as no placement can clear a
+line and every piece fits: the aggregate height, hole and bumpiness terms
+of all placements then differ by amounts that only the contour decides,
+and holes already on the board add the same constant to every score.
+The builder enumerates every contour with differences in [-clip, clip],
+finds the best placement of every piece for one weight vector and writes
+a table of move bytes (rotation << 4 | column, NO_MOVE when none fits)
+that the AI maps read-only. get_best_move consults it for depth-1
+searches, the server default, so /ai-move and /ai-session (responding
+with moves) use it; suggestions rank several placements and always search.
+
+File layout (little-endian):
+    header   magic "TCIX", version u8, clip u8, weights id 8 bytes
+    table    one move byte per (piece in PIECE_TYPES order, contour)
+
+    python contour_index.py --weights best_weights.npy -o best_weights.cix
+"""
+
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from game_engine import (
+    BOARD_HEIGHT, BOARD_WIDTH, PIECE_INDEX, PIECE_TYPES, PLACEMENT_TABLE, TETROMINOS, GameState, weights_id
+)
+
+MAGIC = b"TCIX"
+VERSION = 1
+HEADER = struct.Struct("<4sBB8s")
+DEFAULT_CLIP = 2
+NO_MOVE = 255
+
+# Tallest piece, a board with more headroom than this fits every placement
+MAX_PIECE_HEIGHT = max(info.height for infos in PLACEMENT_TABLE.values() for info in infos)
+
+# Contours are enumerated in chunks to bound the builder's memory
+BUILD_CHUNK = 1 << 18
+
+
+class ContourIndexError(Exception):
+    pass
+
+
+def index_path(weights_path: str) -> str:
+    """Index file kept next to a weights .npy file"""
+    return os.path.splitext(weights_path)[0] + ".cix"
+
+
+def contour_count(clip: int) -> int:
+    return (2 * clip + 1) ** (BOARD_WIDTH - 1)
+
+
+def _contour_heights(start: int, stop: int, clip: int) -> np.ndarray:
+    """Column heights (first column at 0) of contours start..stop-1, one row per column"""
+    base = 2 * clip + 1
+    codes = np.arange(start, stop, dtype=np.int64)
+    heights = np.zeros((BOARD_WIDTH, len(codes)), dtype=np.int32)
+    for i in range(1, BOARD_WIDTH):
+        heights[i] = heights[i - 1] + (codes % base - clip)
+        codes //= base
+    return heights
+
+
+def _cleared_scores(
+    heights: np.ndarray,
+    base: np.ndarray,
+    full: List[Tuple[int, np.ndarray]],
+    info,
+    x: int,
+    weights: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Relative scores of a drop that clears lines, and whether each is unknowable.
+
+    full holds (level above base, mask) of every piece row. Columns are
+    hole-free above the lowest column, so a column whose top is cleared
+    falls to the next level below; one that falls to the lowest column's
+    height or below depends on holes the contour doesn't know about.
+    """
+    w_height, w_holes, w_bumpiness, w_lines = weights[:4]
+    lowest = heights.min(axis=0)
+    lines = sum(mask.astype(np.int32) for _, mask in full)
+    after = []
+    uncertain = np.zeros(len(base), dtype=bool)
+    for j in range(BOARD_WIDTH):
+        c = j - x
+        if 0 <= c < info.width:
+            gap_top = base + (info.height - 1 - info.bottom[c])
+            top = base + (info.height - info.top[c])
+        else:
+            gap_top = None
+            top = heights[j].copy()
+        # Cleared rows from the highest down, so a falling top meets them in order
+        for level, mask in full:
+            hit = mask & (top == base + level)
+            top = np.where(hit, top - 1, top)
+            if gap_top is not None:
+                # Below the piece cells is the gap the drop left, then the old top
+                top = np.where(hit & (top > heights[j]) & (top <= gap_top), heights[j], top)
+        uncertain |= (top < heights[j]) & (top <= lowest)
+        below = sum((mask & (base + level < top)).astype(np.int32) for level, mask in full)
+        after.append(top - below)
+    after = np.array(after)
+
+    height_change = after.sum(axis=0) - heights.sum(axis=0)
+    holes_change = height_change - 4 + BOARD_WIDTH * lines
+    bumpiness_change = np.abs(np.diff(after, axis=0)).sum(axis=0) - np.abs(np.diff(heights, axis=0)).sum(axis=0)
+    score = w_height * height_change + w_holes * holes_change + w_bumpiness * bumpiness_change + w_lines * lines
+    return score, uncertain
+
+
+def _best_moves(heights: np.ndarray, key: str, weights: np.ndarray) -> np.ndarray:
+    """Move byte of the best hard drop of key on every height profile.
+
+    Rows between the lowest and the fifth lowest column are taken to be
+    hole-free, the only rows a drop can complete. Scores are relative to the
+    board before the drop, and placements are tried in legal_placements
+    order so ties go to the same move the full search picks. Profiles where
+    some drop's score depends on holes below the surface get NO_MOVE.
+    """
+    w_height, w_holes, w_bumpiness = weights[:3]
+    count = heights.shape[1]
+    # prefix[i]: sum of the first i heights; steps[i]: bumpiness of the first i + 1 columns
+    prefix = np.zeros((BOARD_WIDTH + 1, count), dtype=np.int32)
+    np.cumsum(heights, axis=0, out=prefix[1:])
+    steps = np.zeros((BOARD_WIDTH, count), dtype=np.int32)
+    np.cumsum(np.abs(np.diff(heights, axis=0)), axis=0, out=steps[1:])
+    # Lowest column left of i (first_min[i]) and from i on (last_min[i])
+    unbounded = np.full(count, np.iinfo(np.int32).max, dtype=np.int32)
+    first_min = [unbounded] + list(np.minimum.accumulate(heights, axis=0))
+    last_min = list(np.minimum.accumulate(heights[::-1], axis=0)[::-1]) + [unbounded]
+
+    best_score = np.full(count, -np.inf)
+    best_move = np.full(count, NO_MOVE, dtype=np.uint8)
+    uncertain = np.zeros(count, dtype=bool)
+    for rotation, info in enumerate(PLACEMENT_TABLE[key]):
+        width = info.width
+        shape = TETROMINOS[key][rotation]
+        # Height of each piece column's lowest cell above the piece bottom,
+        # and of its highest cell's top
+        lift = [info.height - 1 - bottom for bottom in info.bottom]
+        rise = [info.height - top for top in info.top]
+        inner = sum(abs(b - a) for a, b in zip(rise, rise[1:]))
+        for x in range(BOARD_WIDTH - width + 1):
+            base = heights[x] - lift[0]
+            for c in range(1, width):
+                base = np.maximum(base, heights[x + c] - lift[c])
+            covered = prefix[x + width] - prefix[x]
+            raised = width * base - covered
+            bumpiness = inner - (steps[min(x + width, BOARD_WIDTH - 1)] - steps[max(x - 1, 0)])
+            if x > 0:
+                bumpiness = bumpiness + np.abs(base + rise[0] - heights[x - 1])
+            if x + width < BOARD_WIDTH:
+                bumpiness = bumpiness + np.abs(heights[x + width] - base - rise[-1])
+            score = (w_height * (raised + sum(rise))
+                     + w_holes * (raised + sum(lift))
+                     + w_bumpiness * bumpiness)
+
+            # A piece row is completed when every column it leaves empty is already that high
+            outside = np.minimum(first_min[x], last_min[x + width])
+            full = []
+            for r, row in enumerate(shape):
+                level = info.height - r
+                mask = outside >= base + level
+                for c, cell in enumerate(row):
+                    if not cell:
+                        mask &= heights[x + c] >= base + level
+                full.append((level, mask))
+            clears = np.flatnonzero(np.logical_or.reduce([mask for _, mask in full]))
+            if len(clears):
+                cleared, unknown = _cleared_scores(
+                    heights[:, clears], base[clears],
+                    [(level, mask[clears]) for level, mask in full], info, x, weights
+                )
+                score[clears] = cleared
+                uncertain[clears[unknown]] = True
+
+            better = score > best_score
+            best_score[better] = score[better]
+            best_move[better] = rotation << 4 | x
+    best_move[uncertain] = NO_MOVE
+    return best_move
+
+
+def build_index(weights: np.ndarray, clip: int = DEFAULT_CLIP) -> np.ndarray:
+    """Best move byte per (piece, contour) for weights"""
+    weights = np.asarray(weights, dtype=float)
+    count = contour_count(clip)
+    table = np.empty((len(PIECE_TYPES), count), dtype=np.uint8)
+    for start in range(0, count, BUILD_CHUNK):
+        stop = min(start + BUILD_CHUNK, count)
+        heights = _contour_heights(start, stop, clip)
+        for i, key in enumerate(PIECE_TYPES):
+            table[i, start:stop] = _best_moves(heights, key, weights)
+    return table
+
+
+def save_index(path: str, weights: np.ndarray, clip: int = DEFAULT_CLIP):
+    """Build the index for weights and replace path with it atomically"""
+    table = build_index(weights, clip)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".cix.tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, clip, weights_id(weights)))
+            f.write(table.tobytes())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ContourIndex:
+    """Read-only, memory-mapped contour index"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ContourIndexError(f"{path} is not a contour index")
+        magic, version, self.clip, self.weights_id = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ContourIndexError(f"{path} is not a version {VERSION} contour index")
+        self.path = path
+        self.table = np.memmap(
+            path, dtype=np.uint8, mode='r', offset=HEADER.size,
+            shape=(len(PIECE_TYPES), contour_count(self.clip))
+        )
+        self._powers = [(2 * self.clip + 1) ** i for i in range(BOARD_WIDTH - 1)]
+
+    def contour(self, heights: List[int]) -> Optional[int]:
+        """Contour code of a height profile, None when a difference is clipped"""
+        clip = self.clip
+        code = 0
+        for power, a, b in zip(self._powers, heights, heights[1:]):
+            diff = b - a
+            if not -clip <= diff <= clip:
+                return None
+            code += (diff + clip) * power
+        return code
+
+    def lookup(self, game: GameState) -> Optional[Tuple[int, int]]:
+        """(rotation, column) of the best hard drop, None when the index doesn't apply"""
+        heights = game.heights
+        if max(heights) > BOARD_HEIGHT - MAX_PIECE_HEIGHT or not _surface_hole_free(game):
+            return None
+        code = self.contour(heights)
+        if code is None:
+            return None
+        move = int(self.table[PIECE_INDEX[game.current_piece.key], code])
+        if move == NO_MOVE:
+            return None
+        return move >> 4, move & 0xF
+
+
+def _surface_hole_free(game: GameState) -> bool:
+    """True when the rows a single piece could complete have no holes.
+
+    Those are the rows above the lowest column up to the fifth lowest one;
+    higher rows have more gaps than a piece can fill.
+    """
+    heights = sorted(game.heights)
+    row_cells = game.row_cells
+    for k in range(heights[0] + 1, heights[4] + 1):
+        if row_cells[BOARD_HEIGHT - k] != BOARD_WIDTH - bisect_left(heights, k):
+            return False
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the surface-contour move index")
+    parser.add_argument('--weights', default="best_weights.npy", help="weights .npy file (default AI weights if missing)")
+    parser.add_argument('-o', '--output', help="index file (default: next to the weights file)")
+    parser.add_argument('--clip', type=int, default=DEFAULT_CLIP, help="largest height difference kept in a contour")
+    args = parser.parse_args()
+
+    if os.path.exists(args.weights):
+        weights = np.load(args.weights, allow_pickle=True).flatten()
+    else:
+        from ai_engine import TetrisAI
+        weights = TetrisAI().weights
+    output = args.output or index_path(args.weights)
+
+    start = time.perf_counter()
+    save_index(output, weights, args.clip)
+    print(f"Wrote {len(PIECE_TYPES) * contour_count(args.clip)} moves to {output} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,11 @@
 # be/game_engine.py
 """Core Tetris game engine - extracted from tetris_game.py"""
 
+import hashlib
 import numpy as np
 import random
 from typing import List, Tuple, Dict, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 
 # Constants
 BOARD_WIDTH = 10
@@ -26,14 +27,364 @@ COLORS = {
     'S': '#00f000', 'Z': '#f00000', 'J': '#0000f0', 'L': '#f0a000'
 }
 
+# Piece types in a fixed order, for compact encodings (replays, binary
+# protocol, index files); UNKNOWN_PIECE stands for "no piece"
+PIECE_TYPES = list(TETROMINOS.keys())
+PIECE_INDEX = {key: i for i, key in enumerate(PIECE_TYPES)}
+UNKNOWN_PIECE = 255
 
-@dataclass
+# Bitboard representation: one integer per row, bit c set when column c is filled
+FULL_ROW = (1 << BOARD_WIDTH) - 1
+
+
+def _shape_row_masks(shape: List[List[int]]) -> Tuple[int, ...]:
+    """Row masks of a shape placed at x = 0"""
+    return tuple(
+        sum(1 << c for c, cell in enumerate(row) if cell)
+        for row in shape
+    )
+
+
+# Precomputed row masks for every piece rotation
+PIECE_ROW_MASKS = {
+    key: [_shape_row_masks(shape) for shape in shapes]
+    for key, shapes in TETROMINOS.items()
+}
+
+
+
+@dataclass(frozen=True)
+class RotationInfo:
+    """Static placement data for one rotation of a piece"""
+    cells: Tuple[Tuple[int, int], ...]  # (row, col) offsets of filled cells
+    width: int
+    height: int
+    bottom: Tuple[int, ...]  # per column, row offset of the lowest filled cell
+    top: Tuple[int, ...]  # per column, row offset of the highest filled cell
+    row_masks: Tuple[int, ...]
+    row_counts: Tuple[int, ...]  # filled cells per row
+
+
+def _rotation_info(shape: List[List[int]]) -> RotationInfo:
+    cells = tuple(
+        (r, c)
+        for r, row in enumerate(shape)
+        for c, cell in enumerate(row) if cell
+    )
+    width = len(shape[0])
+    return RotationInfo(
+        cells=cells,
+        width=width,
+        height=len(shape),
+        bottom=tuple(max(r for r, cc in cells if cc == c) for c in range(width)),
+        top=tuple(min(r for r, cc in cells if cc == c) for c in range(width)),
+        row_masks=_shape_row_masks(shape),
+        row_counts=tuple(sum(row) for row in shape)
+    )
+
+
+# Per piece, per rotation placement data, built once from TETROMINOS
+PLACEMENT_TABLE = {
+    key: [_rotation_info(shape) for shape in shapes]
+    for key, shapes in TETROMINOS.items()
+}
+
+_COLUMN_BITS = 1 << np.arange(BOARD_WIDTH, dtype=np.int64)
+_ROW_BITS = 1 << np.arange(BOARD_HEIGHT, dtype=np.int64)
+
+
+def board_to_rows(board: np.ndarray) -> List[int]:
+    """Convert a 2D board array to a list of row masks"""
+    filled = (np.asarray(board) != 0).astype(np.int64)
+    return [int(mask) for mask in filled @ _COLUMN_BITS]
+
+
+def rows_to_board(rows: List[int]) -> np.ndarray:
+    """Convert a list of row masks to a 2D board array"""
+    masks = np.asarray(rows, dtype=np.int64).reshape(-1, 1)
+    return ((masks & _COLUMN_BITS) != 0).astype(int)
+
+
+# Cells of every row mask as a list row, for serializing bitboards without numpy
+ROW_CELLS = tuple(
+    tuple((mask >> c) & 1 for c in range(BOARD_WIDTH)) for mask in range(FULL_ROW + 1)
+)
+
+
+def column_masks(board: np.ndarray) -> List[int]:
+    """Convert a 2D board array to a list of column masks, bit y set when row y is filled"""
+    filled = (np.asarray(board) != 0).astype(np.int64)
+    return [int(mask) for mask in _ROW_BITS @ filled]
+
+
+FNV_OFFSET = 0x811C9DC5
+FNV_PRIME = 0x01000193
+
+
+def board_hash(rows: List[int]) -> int:
+    """32-bit FNV-1a hash of the row masks, each as 2 little-endian bytes, top row first"""
+    h = FNV_OFFSET
+    for mask in rows:
+        for byte in (mask & 0xFF, mask >> 8):
+            h = ((h ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    return h
+
+
+def weights_id(weights) -> bytes:
+    """Short stable id of a weight vector"""
+    return hashlib.blake2b(np.asarray(weights, dtype=np.float64).tobytes(), digest_size=8).digest()
+
+
+def column_heights(board: np.ndarray) -> List[int]:
+    """Height of the highest filled cell in each column"""
+    filled = np.asarray(board) != 0
+    heights = np.where(filled.any(axis=0), filled.shape[0] - np.argmax(filled, axis=0), 0)
+    return heights.tolist()
+
+
+def landing_row(heights: List[int], info: RotationInfo, x: int) -> int:
+    """Row a rotation hard-dropped at column x comes to rest on (negative if it does not fit)"""
+    return min(
+        BOARD_HEIGHT - 1 - heights[x + c] - info.bottom[c]
+        for c in range(info.width)
+    )
+
+
+def legal_placements(heights: List[int], key: str) -> List[Tuple[int, int, int]]:
+    """All (rotation, x, landing y) hard drops of a piece that fit on the board"""
+    placements = []
+    for rotation, info in enumerate(PLACEMENT_TABLE[key]):
+        for x in range(BOARD_WIDTH - info.width + 1):
+            y = landing_row(heights, info, x)
+            if y >= 0:
+                placements.append((rotation, x, y))
+    return placements
+
+
+# Offsets tried in order when a piece is rotated, as (dx, dy); the same kicks as the frontend
+ROTATION_KICKS = ((0, 0), (1, 0), (-1, 0), (0, -1))
+
+
+# Reachability works on all columns at once: one int holds a row bitmask
+# per x, LANE bits apart, so moving left or right is a shift by LANE
+LANE = 64
+
+
+def _reach_info(info: RotationInfo) -> Tuple[int, Tuple[int, ...]]:
+    """(in-bounds positions, shift of the packed columns per filled cell) of a rotation"""
+    rows = (1 << (BOARD_HEIGHT - info.height + 1)) - 1
+    in_bounds = sum(rows << (LANE * x) for x in range(BOARD_WIDTH - info.width + 1))
+    return in_bounds, tuple(LANE * c + r for r, c in info.cells)
+
+
+REACH_TABLE = {
+    key: [_reach_info(info) for info in infos]
+    for key, infos in PLACEMENT_TABLE.items()
+}
+
+
+def pack_columns(columns: List[int]) -> int:
+    """Column masks (see column_masks) packed LANE bits apart"""
+    packed = 0
+    for x, mask in enumerate(columns):
+        packed |= mask << (LANE * x)
+    return packed
+
+
+def _fill_down(seeds: int, free: int) -> int:
+    """Extend every seed bit to the higher rows of its run of free bits"""
+    # Kogge-Stone fill: log2(BOARD_HEIGHT) shifts instead of one per row
+    g, p = seeds, free
+    g |= p & (g << 1)
+    p &= p << 1
+    g |= p & (g << 2)
+    p &= p << 2
+    g |= p & (g << 4)
+    p &= p << 4
+    g |= p & (g << 8)
+    p &= p << 8
+    return g | (p & (g << 16))
+
+
+def free_positions(packed: int, key: str) -> List[int]:
+    """Per rotation, the packed (x, y) positions at which the piece fits"""
+    free = []
+    for in_bounds, shifts in REACH_TABLE[key]:
+        blocked = 0
+        for shift in shifts:
+            blocked |= packed >> shift
+        free.append(in_bounds & ~blocked)
+    return free
+
+
+def reachable_placements(
+    columns: List[int],
+    key: str,
+    start: Optional[Tuple[int, int, int]] = None
+) -> List[Tuple[int, int, int]]:
+    """All (rotation, x, y) resting positions reachable by moves, soft drops and rotations.
+
+    The search starts where hard drops start, every rotation and column at
+    the top row, and at start, the (rotation, x, y) of the piece in play.
+    Pieces move left, right and down, and rotate with ROTATION_KICKS, so
+    slides under overhangs, tucks and spins are found. Positions are
+    bitsets over every (x, y) of a rotation, so each step moves all of them
+    at once. Includes every placement legal_placements returns.
+    """
+    free = free_positions(pack_columns(columns), key)
+    top = sum(1 << (LANE * x) for x in range(BOARD_WIDTH))
+    reached = [_fill_down(mask & top, mask) for mask in free]
+    if start is not None:
+        rotation, x, y = start
+        if 0 <= x < BOARD_WIDTH and 0 <= y < BOARD_HEIGHT:
+            mask = free[rotation]
+            reached[rotation] |= _fill_down(mask & 1 << (LANE * x + y), mask)
+
+    rotations = len(free)
+    changed = True
+    while changed:
+        changed = False
+        for r in range(rotations):
+            mask = free[r]
+            bits = reached[r]
+            # Slide left and right (and drop) until nothing new is reached
+            while True:
+                slid = _fill_down(bits | ((bits << LANE | bits >> LANE) & mask), mask)
+                if slid == bits:
+                    break
+                bits = slid
+            reached[r] = bits
+            if rotations == 1:
+                continue
+
+            turned = (r + 1) % rotations
+            target = free[turned]
+            remaining = bits
+            rotated = 0
+            for dx, dy in ROTATION_KICKS:
+                offset = LANE * dx + dy
+                moved = (remaining << offset if offset >= 0 else remaining >> -offset) & target
+                rotated |= moved
+                remaining &= ~(moved >> offset if offset >= 0 else moved << -offset)
+            new = rotated & ~reached[turned]
+            if new:
+                reached[turned] |= _fill_down(new, target)
+                changed = True
+
+    placements = []
+    for r, bits in enumerate(reached):
+        # Resting: reached, and one row lower does not fit
+        resting = bits & ~(free[r] >> 1)
+        while resting:
+            low = resting & -resting
+            position = low.bit_length() - 1
+            placements.append((r, position // LANE, position % LANE))
+            resting ^= low
+    return placements
+
+
+def compute_features_batch(boards: np.ndarray) -> Dict[str, np.ndarray]:
+    """Calculate board features for a stack of boards (N x height x width)"""
+    filled = np.asarray(boards) != 0
+    height = filled.shape[1]
+    
+    # Column heights from the first filled cell of each column
+    heights = np.where(filled.any(axis=1), height - np.argmax(filled, axis=1), 0)
+    
+    # Holes: empty cells with a filled cell somewhere above them
+    covered = np.maximum.accumulate(filled, axis=1)
+    holes = np.sum(covered & ~filled, axis=(1, 2))
+    
+    # Bumpiness (height differences)
+    bumpiness = np.sum(np.abs(np.diff(heights, axis=1)), axis=1)
+    
+    return {
+        'aggregate_height': heights.sum(axis=1),
+        'holes': holes,
+        'bumpiness': bumpiness,
+        'max_height': heights.max(axis=1)
+    }
+
+
+def clear_full_rows(boards: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Clear completed lines on a stack of boards in place, return (boards, lines cleared)"""
+    full = (np.asarray(boards) != 0).all(axis=2)
+    cleared = full.sum(axis=1)
+    touched = np.flatnonzero(cleared)
+    if len(touched) == 0:
+        return boards, cleared
+    
+    # Stable sort moves full rows to the top while keeping the others in order
+    order = np.argsort(~full[touched], axis=1, kind='stable')
+    shifted = np.take_along_axis(boards[touched], order[:, :, np.newaxis], axis=1)
+    shifted[np.arange(shifted.shape[1]) < cleared[touched, np.newaxis]] = 0
+    boards[touched] = shifted
+    return boards, cleared
+
+
+def apply_placements(
+    board: np.ndarray,
+    key: str,
+    placements: List[Tuple[int, int, int]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Lock one piece at each (rotation, x, y) on copies of board.
+
+    Returns the resulting boards (N x height x width, lines already cleared)
+    and the number of lines each placement cleared.
+    """
+    boards = np.repeat((np.asarray(board) != 0)[np.newaxis], len(placements), axis=0)
+    index, rows, cols = [], [], []
+    table = PLACEMENT_TABLE[key]
+    for i, (rotation, x, y) in enumerate(placements):
+        for r, c in table[rotation].cells:
+            index.append(i)
+            rows.append(y + r)
+            cols.append(x + c)
+    boards[index, rows, cols] = True
+    return clear_full_rows(boards)
+
+
+def _piece_json_tail(shape: List[List[int]], color: str) -> str:
+    """Pre-encoded JSON of the static part of a piece payload"""
+    rows = ','.join('[' + ','.join(str(cell) for cell in row) + ']' for row in shape)
+    return f',"shape":[{rows}],"color":"{color}"}}'
+
+
+# Static payload of every (key, rotation): shape and color, as dict items and as JSON
+PIECE_PAYLOADS = {
+    (key, rotation): {'shape': shape, 'color': COLORS[key]}
+    for key, shapes in TETROMINOS.items()
+    for rotation, shape in enumerate(shapes)
+}
+PIECE_JSON_TAILS = {
+    (key, rotation): _piece_json_tail(shape, COLORS[key])
+    for key, shapes in TETROMINOS.items()
+    for rotation, shape in enumerate(shapes)
+}
+
+# Interned pieces, filled on first use; only positions near the board are kept
+_PIECES: Dict[Tuple[str, int, int, int], 'Piece'] = {}
+
+
+@dataclass(frozen=True, slots=True)
 class Piece:
+    """A tetromino at a position. Pieces are immutable, moving one returns
+    another; Piece.at returns one shared instance per position."""
     key: str
     rotation: int
     x: int
     y: int
-    
+
+    @classmethod
+    def at(cls, key: str, rotation: int, x: int, y: int) -> 'Piece':
+        """Interned piece, so hot paths don't allocate one per step"""
+        piece = _PIECES.get((key, rotation, x, y))
+        if piece is None:
+            piece = cls(key, rotation, x, y)
+            if (key, rotation) in PIECE_PAYLOADS and -4 <= x < BOARD_WIDTH and -4 <= y < BOARD_HEIGHT:
+                _PIECES[key, rotation, x, y] = piece
+        return piece
+
     @property
     def shape(self):
         return TETROMINOS[self.key][self.rotation]
@@ -44,21 +395,37 @@ class Piece:
     
     def rotate(self):
         max_rot = len(TETROMINOS[self.key])
-        return Piece(self.key, (self.rotation + 1) % max_rot, self.x, self.y)
+        return Piece.at(self.key, (self.rotation + 1) % max_rot, self.x, self.y)
     
     def move(self, dx: int, dy: int):
-        return Piece(self.key, self.rotation, self.x + dx, self.y + dy)
+        return Piece.at(self.key, self.rotation, self.x + dx, self.y + dy)
     
     def to_dict(self):
         return {
-            **asdict(self),
-            'shape': self.shape,
-            'color': self.color
+            'key': self.key,
+            'rotation': self.rotation,
+            'x': self.x,
+            'y': self.y,
+            **PIECE_PAYLOADS[self.key, self.rotation]
         }
 
+    def to_json(self) -> str:
+        """Same as json.dumps(self.to_dict()) with compact separators"""
+        return '{"key":"%s","rotation":%d,"x":%d,"y":%d%s' % (
+            self.key, self.rotation, self.x, self.y, PIECE_JSON_TAILS[self.key, self.rotation]
+        )
+
 
 class GameState:
-    """Manages the game state"""
+    """Manages the game state.
+
+    Column heights, filled cells per column and filled cells per row are
+    kept up to date by lock_piece and _clear_lines, so the features of the
+    board, and of a candidate placement, need no scan over all cells.
+    Assigning ``board`` marks them stale and they are rebuilt on first use,
+    so a board that is set and played once costs no more than before.
+    Change cells only through _place.
+    """
     
     def __init__(self, seed: Optional[int] = None):
         self.board = np.zeros((BOARD_HEIGHT, BOARD_WIDTH), dtype=int)
@@ -71,6 +438,110 @@ class GameState:
         self.current_piece = self._spawn_piece()
         self.next_piece_type = self._random_piece_type()
     
+    @property
+    def board(self) -> np.ndarray:
+        return self._board
+    
+    @board.setter
+    def board(self, value: np.ndarray):
+        self._board = value
+        self._invalidate_stats()
+    
+    def _invalidate_stats(self):
+        self._heights: Optional[List[int]] = None
+        self._totals = None
+    
+    def _rebuild_stats(self):
+        filled = np.asarray(self.board) != 0
+        self._totals = None
+        if not filled.any():
+            self._heights = [0] * BOARD_WIDTH
+            self._column_cells = [0] * BOARD_WIDTH
+            self._row_cells = [0] * BOARD_HEIGHT
+            return
+        self._column_cells = filled.sum(axis=0).tolist()
+        self._row_cells = filled.sum(axis=1).tolist()
+        self._heights = np.where(
+            self._column_cells, BOARD_HEIGHT - np.argmax(filled, axis=0), 0
+        ).tolist()
+    
+    @property
+    def heights(self) -> List[int]:
+        """Height of each column"""
+        if self._heights is None:
+            self._rebuild_stats()
+        return self._heights
+    
+    @property
+    def column_cells(self) -> List[int]:
+        """Filled cells in each column"""
+        if self._heights is None:
+            self._rebuild_stats()
+        return self._column_cells
+    
+    @property
+    def row_cells(self) -> List[int]:
+        """Filled cells in each row"""
+        if self._heights is None:
+            self._rebuild_stats()
+        return self._row_cells
+    
+    def _board_totals(self) -> Tuple[int, int, int, int]:
+        """(aggregate height, filled cells, bumpiness, max height), cached until the board changes"""
+        if self._totals is None:
+            heights = self.heights
+            self._totals = (
+                sum(heights),
+                sum(self.column_cells),
+                sum(abs(a - b) for a, b in zip(heights, heights[1:])),
+                max(heights)
+            )
+        return self._totals
+    
+    def _filled(self, row: int, col: int) -> bool:
+        return bool(self._board[row, col])
+    
+    def _column_height(self, col: int) -> int:
+        for row in range(BOARD_HEIGHT):
+            if self._filled(row, col):
+                return BOARD_HEIGHT - row
+        return 0
+    
+    @property
+    def column_holes(self) -> List[int]:
+        """Empty cells below the top of each column"""
+        return [h - n for h, n in zip(self.heights, self.column_cells)]
+    
+    def _track_place(self, piece: Piece):
+        """Update the stats for cells just written by _place"""
+        heights = self._heights
+        if heights is None:
+            return  # Stale, rebuilt from the board when next used
+        info = PLACEMENT_TABLE[piece.key][piece.rotation]
+        for r, c in info.cells:
+            self._row_cells[piece.y + r] += 1
+            self._column_cells[piece.x + c] += 1
+        for c in range(info.width):
+            heights[piece.x + c] = max(heights[piece.x + c], BOARD_HEIGHT - piece.y - info.top[c])
+        self._totals = None
+    
+    def _track_clear(self, full_rows: List[int]):
+        """Update the stats after full_rows were removed from the board"""
+        heights = self._heights
+        if heights is None:
+            return
+        cleared = len(full_rows)
+        full = set(full_rows)
+        self._row_cells = [0] * cleared + [n for r, n in enumerate(self._row_cells) if r not in full]
+        for c in range(BOARD_WIDTH):
+            self._column_cells[c] -= cleared
+            if BOARD_HEIGHT - heights[c] in full:
+                # The top cell was cleared, the new top may be further down
+                heights[c] = self._column_height(c)
+            else:
+                heights[c] -= cleared
+        self._totals = None
+    
     def _random_piece_type(self) -> str:
         return self.rng.choice(self.piece_types)
     
@@ -78,7 +549,7 @@ class GameState:
         piece_type = self.next_piece_type if hasattr(self, 'next_piece_type') else self._random_piece_type()
         shape = TETROMINOS[piece_type][0]
         x = BOARD_WIDTH // 2 - len(shape[0]) // 2
-        return Piece(piece_type, 0, x, 0)
+        return Piece.at(piece_type, 0, x, 0)
     
     def is_valid_position(self, piece: Piece) -> bool:
         """Check if piece position is valid"""
@@ -92,12 +563,17 @@ class GameState:
                         return False
         return True
     
-    def lock_piece(self, piece: Piece):
-        """Lock piece to board"""
+    def _place(self, piece: Piece):
+        """Write piece cells to the board"""
         for r, row in enumerate(piece.shape):
             for c, cell in enumerate(row):
                 if cell:
-                    self.board[piece.y + r, piece.x + c] = 1
+                    self._board[piece.y + r, piece.x + c] = 1
+        self._track_place(piece)
+    
+    def lock_piece(self, piece: Piece):
+        """Lock piece to board"""
+        self._place(piece)
         
         # Clear lines
         lines_cleared = self._clear_lines()
@@ -105,9 +581,9 @@ class GameState:
         self.score += [0, 100, 300, 500, 800][min(lines_cleared, 4)] * self.level
         self.level = self.lines // 10 + 1
         
-        # Spawn new piece
-        self.next_piece_type = self._random_piece_type()
+        # Spawn the announced next piece and draw a new one
         self.current_piece = self._spawn_piece()
+        self.next_piece_type = self._random_piece_type()
         
         if not self.is_valid_position(self.current_piece):
             self.game_over = True
@@ -116,61 +592,186 @@ class GameState:
     
     def _clear_lines(self) -> int:
         """Clear completed lines and return count"""
-        new_board = []
-        cleared = 0
+        if self._heights is None:
+            full = np.flatnonzero(self._board.all(axis=1)).tolist()
+        else:
+            full = [r for r, n in enumerate(self._row_cells) if n == BOARD_WIDTH]
+        if not full:
+            return 0
         
-        for row in self.board:
-            if not all(row):
-                new_board.append(row)
-            else:
-                cleared += 1
-        
-        while len(new_board) < BOARD_HEIGHT:
-            new_board.insert(0, np.zeros(BOARD_WIDTH, dtype=int))
-        
-        self.board = np.array(new_board)
-        return cleared
+        kept = np.delete(self._board, full, axis=0)
+        self._board = np.vstack([np.zeros((len(full), BOARD_WIDTH), dtype=kept.dtype), kept])
+        self._track_clear(full)
+        return len(full)
     
     def get_features(self, board: Optional[np.ndarray] = None) -> Dict[str, float]:
         """Calculate board features for AI"""
-        b = board if board is not None else self.board
-        
-        # Column heights
-        heights = np.zeros(BOARD_WIDTH, dtype=int)
-        for c in range(BOARD_WIDTH):
-            col = b[:, c]
-            if col.any():
-                heights[c] = BOARD_HEIGHT - np.argmax(col)
+        if board is not None:
+            features = compute_features_batch(board[np.newaxis])
+            return {name: int(values[0]) for name, values in features.items()}
+        return self._features(self.heights, self.column_cells)
+    
+    @staticmethod
+    def _features(heights: List[int], column_cells: List[int]) -> Dict[str, int]:
+        return {
+            'aggregate_height': sum(heights),
+            'holes': sum(heights) - sum(column_cells),
+            'bumpiness': sum(abs(a - b) for a, b in zip(heights, heights[1:])),
+            'max_height': max(heights)
+        }
+    
+    def placement_features(self, piece: Piece) -> Dict[str, int]:
+        """Features after locking piece (and clearing lines), without changing the game.
+
+        Also returns 'lines_cleared'. The piece must be in a valid position.
+        """
+        info = PLACEMENT_TABLE[piece.key][piece.rotation]
+        x, y = piece.x, piece.y
+        row_cells = self.row_cells
+        clears = any(
+            row_cells[y + r] + count == BOARD_WIDTH
+            for r, count in enumerate(info.row_counts)
+        )
+        if not clears:
+            return self._placement_delta(info, x, y)
         
-        # Holes (empty cells below filled cells)
-        holes = 0
-        for c in range(BOARD_WIDTH):
-            col = b[:, c]
-            seen = False
-            for cell in col:
-                if cell:
-                    seen = True
-                elif seen:
-                    holes += 1
+        heights = list(self.heights)
+        column_cells = list(self.column_cells)
+        added: Dict[int, int] = {}
+        for r, c in info.cells:
+            added[y + r] = added.get(y + r, 0) + 1
+            column_cells[x + c] += 1
+        for c in range(info.width):
+            heights[x + c] = max(heights[x + c], BOARD_HEIGHT - y - info.top[c])
         
-        # Bumpiness (height differences)
-        bumpiness = int(np.sum(np.abs(np.diff(heights))))
+        full = {row for row, n in added.items() if self.row_cells[row] + n == BOARD_WIDTH}
+        if full:
+            cleared = len(full)
+            cells = {(y + r, x + c) for r, c in info.cells}
+            for c in range(BOARD_WIDTH):
+                column_cells[c] -= cleared
+                top = BOARD_HEIGHT - heights[c]
+                if top not in full:
+                    heights[c] -= cleared
+                    continue
+                # The top cell is cleared: find the next surviving cell below it
+                heights[c] = 0
+                for row in range(top + 1, BOARD_HEIGHT):
+                    if row not in full and ((row, c) in cells or self._filled(row, c)):
+                        below = sum(1 for f in full if f > row)
+                        heights[c] = BOARD_HEIGHT - row - below
+                        break
         
+        features = self._features(heights, column_cells)
+        features['lines_cleared'] = len(full)
+        return features
+    
+    def _placement_delta(self, info: RotationInfo, x: int, y: int) -> Dict[str, int]:
+        """placement_features without line clears, from the cached totals and the touched columns"""
+        aggregate, cells, bumpiness, max_height = self._board_totals()
+        heights = self.heights
+        # Heights of the touched columns and their neighbours, before and after
+        lo, hi = max(x - 1, 0), min(x + info.width, BOARD_WIDTH - 1)
+        before = heights[lo:hi + 1]
+        after = list(before)
+        for c in range(info.width):
+            i = x + c - lo
+            after[i] = max(after[i], BOARD_HEIGHT - y - info.top[c])
+        aggregate += sum(after) - sum(before)
+        bumpiness += (
+            sum(abs(a - b) for a, b in zip(after, after[1:]))
+            - sum(abs(a - b) for a, b in zip(before, before[1:]))
+        )
         return {
-            'aggregate_height': int(np.sum(heights)),
-            'holes': holes,
+            'aggregate_height': aggregate,
+            'holes': aggregate - cells - len(info.cells),
             'bumpiness': bumpiness,
-            'max_height': int(np.max(heights))
+            'max_height': max(max_height, max(after)),
+            'lines_cleared': 0
         }
     
     def to_dict(self) -> Dict:
         """Serialize to dict for API"""
         return {
-            'board': self.board.tolist(),
+            'board': self._board_lists(),
             'current_piece': self.current_piece.to_dict(),
             'next_piece_type': self.next_piece_type,
             'score': self.score,
             'lines': self.lines,
             'level': self.level,
             'game_over': self.game_over
-        }
\ No newline at end of file
+        }
+
+    def _board_lists(self) -> List[List[int]]:
+        return self.board.tolist()
+
+
+class BitboardGameState(GameState):
+    """GameState backed by integer row masks instead of a 2D array.
+
+    Collision tests, locking and line clears are bitwise operations on
+    ``self.rows``. ``board`` is still readable and assignable as a 2D array,
+    so the class is a drop-in replacement for ``GameState``; the array it
+    returns is a read-only snapshot, assign a new array to change the board.
+    """
+    
+    @property
+    def board(self) -> np.ndarray:
+        if self._board_cache is None:
+            self._board_cache = rows_to_board(self.rows)
+            self._board_cache.flags.writeable = False
+        return self._board_cache
+    
+    @board.setter
+    def board(self, value: np.ndarray):
+        self.set_rows(board_to_rows(value))
+    
+    def set_rows(self, rows: List[int]):
+        """Replace the board with the given row masks"""
+        self.rows = rows
+        self._board_cache = None
+        self._invalidate_stats()
+    
+    def _filled(self, row: int, col: int) -> bool:
+        return bool(self.rows[row] >> col & 1)
+    
+    def _board_lists(self) -> List[List[int]]:
+        return [list(ROW_CELLS[mask]) for mask in self.rows]
+    
+    def is_valid_position(self, piece: Piece) -> bool:
+        """Check if piece position is valid"""
+        masks = PIECE_ROW_MASKS[piece.key][piece.rotation]
+        x, y = piece.x, piece.y
+        if x < 0 or y < 0 or y + len(masks) > BOARD_HEIGHT:
+            return False
+        if x + len(TETROMINOS[piece.key][piece.rotation][0]) > BOARD_WIDTH:
+            return False
+        rows = self.rows
+        for r, mask in enumerate(masks):
+            if rows[y + r] & (mask << x):
+                return False
+        return True
+    
+    def _place(self, piece: Piece):
+        """Write piece cells to the board"""
+        rows = self.rows
+        for r, mask in enumerate(PIECE_ROW_MASKS[piece.key][piece.rotation]):
+            rows[piece.y + r] |= mask << piece.x
+        self._board_cache = None
+        self._track_place(piece)
+    
+    def _clear_lines(self) -> int:
+        """Clear completed lines and return count"""
+        full = [r for r, row in enumerate(self.rows) if row == FULL_ROW]
+        if full:
+            self.rows = [0] * len(full) + [row for row in self.rows if row != FULL_ROW]
+            self._board_cache = None
+            self._track_clear(full)
+        return len(full)
+
+
+# Board representations selectable by name
+ENGINES = {
+    'array': GameState,
+    'bitboard': BitboardGameState,
+}
@@ -0,0 +1,255 @@
+"""Training jobs, each run in its own process.
+
+The API process only starts jobs and relays their progress: the genetic
+algorithm runs in a child process (which may start its own worker pool),
+so it never holds the server's GIL. A child saves its weights with a
+write-to-temp plus os.replace, rebuilds the contour move index for them
+when index_path is set, then hands them back; the server swaps them in
+with on_complete. At most max_running jobs run at once, later ones wait
+in a queue. Jobs can be cancelled while queued or running; shutdown (also
+run at exit) cancels them all and waits for the children to exit.
+
+Job ids are random so they stay unique across server workers. With claim
+and release (see WeightsStore.claim_training) a manager only takes jobs
+while no other worker's manager has unfinished ones.
+"""
+
+import atexit
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from broadcast import ProgressBroadcaster
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETE = "complete"
+ERROR = "error"
+CANCELLED = "cancelled"
+FINISHED = (COMPLETE, ERROR, CANCELLED)
+
+
+class TrainingBusyError(Exception):
+    """Another server worker is running training jobs"""
+
+
+def save_weights_atomic(path: str, weights: np.ndarray):
+    """Write a .npy file so readers see either the old or the new weights"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy.tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, weights)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _run_job(params: Dict, weights_path: str, index_path: Optional[str], conn):
+    """Child process: train, save the weights (and their index) and report over conn"""
+    # Let the server process win CPU contention, and turn SIGTERM from a
+    # cancel into an exception so the trainer shuts its worker pool down
+    os.nice(10)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+
+    from trainer import train_weights
+    try:
+        weights, best_score = train_weights(callback=conn.send, **params)
+        save_weights_atomic(weights_path, weights)
+        if index_path:
+            from contour_index import save_index
+            conn.send({"message": "Building move index..."})
+            save_index(index_path, weights)
+        conn.send({"status": COMPLETE, "best_score": best_score, "progress": 100,
+                   "message": "Training complete", "weights": weights.tolist()})
+    except Exception as e:
+        conn.send({"status": ERROR, "message": str(e)})
+    finally:
+        conn.close()
+
+
+class TrainingJob:
+    def __init__(self, job_id: str, params: Dict, progress_interval: float):
+        self.id = job_id
+        self.params = params
+        self.state: Dict = {"status": QUEUED, "progress": 0, "generation": 0, "best_score": 0}
+        self.progress = ProgressBroadcaster(progress_interval)
+        self.process: Optional[multiprocessing.Process] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.individuals = 0
+        self.games = 0
+
+    @property
+    def status(self) -> str:
+        return self.state["status"]
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "params": self.params,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "individuals": self.individuals,
+            "games": self.games,
+            **self.state
+        }
+
+
+class JobManager:
+    """Queue of training jobs with at most max_running child processes"""
+
+    def __init__(
+        self,
+        max_running: int = 1,
+        weights_path: str = "best_weights.npy",
+        index_path: Optional[str] = None,
+        progress_interval: float = 0.25,
+        on_progress: Optional[Callable[[TrainingJob, int, int], None]] = None,
+        on_complete: Optional[Callable[[np.ndarray], None]] = None,
+        claim: Optional[Callable[[], bool]] = None,
+        release: Optional[Callable[[], None]] = None
+    ):
+        self.max_running = max_running
+        self.weights_path = weights_path
+        self.index_path = index_path
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.claim = claim
+        self.release = release
+        self.jobs: Dict[str, TrainingJob] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        # spawn: the server process has threads, forking it is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        # Children aren't daemonic (they may start worker pools), so make
+        # sure they don't outlive the server
+        atexit.register(self.shutdown)
+
+    def submit(self, params: Dict) -> TrainingJob:
+        """Queue a job; call on the event loop so listeners can attach right away"""
+        with self._lock:
+            if self.claim is not None and not self.claim():
+                raise TrainingBusyError("Training is running in another server worker")
+            job = TrainingJob(uuid.uuid4().hex, params, self.progress_interval)
+            self.jobs[job.id] = job
+        job.progress.reset(job.state)
+        self._start_queued()
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[TrainingJob]:
+        return list(self.jobs.values())
+
+    def running(self) -> List[TrainingJob]:
+        return [job for job in self.jobs.values() if job.status == RUNNING]
+
+    def unfinished(self) -> List[TrainingJob]:
+        return [job for job in self.jobs.values() if job.status not in FINISHED]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job, False if it already finished"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            if job.status == QUEUED:
+                self._finish(job, {"status": CANCELLED})
+                return True
+            job.state["cancel_requested"] = True
+        job.process.terminate()
+        return True
+
+    def shutdown(self, timeout: float = 10.0):
+        """Cancel every job and wait for the running ones to exit"""
+        with self._lock:
+            self._closed = True
+        for job in self.list():
+            self.cancel(job.id)
+        for job in self.list():
+            if job.process is not None:
+                job.process.join(timeout)
+                if job.process.is_alive():
+                    job.process.kill()
+                    job.process.join()
+
+    def _start_queued(self):
+        with self._lock:
+            while not self._closed and len(self.running()) < self.max_running:
+                queued = [job for job in self.jobs.values() if job.status == QUEUED]
+                if not queued:
+                    return
+                self._start(queued[0])
+
+    def _start(self, job: TrainingJob):
+        receiver, sender = self._context.Pipe(duplex=False)
+        job.process = self._context.Process(
+            target=_run_job, args=(job.params, self.weights_path, self.index_path, sender),
+            name=f"training-job-{job.id}"
+        )
+        job.process.start()
+        sender.close()
+        job.started = time.time()
+        job.state.update({"status": RUNNING, "message": "Starting training..."})
+        job.progress.publish(job.state)
+        threading.Thread(target=self._relay, args=(job, receiver), daemon=True).start()
+
+    def _relay(self, job: TrainingJob, receiver):
+        """Forward a child's messages until it exits"""
+        final = None
+        try:
+            while True:
+                message = receiver.recv()
+                if message.get("status") in FINISHED:
+                    final = message
+                    break
+                job.state.update(message)
+                individuals = message.get("individuals_total", job.individuals) - job.individuals
+                games = message.get("games_total", job.games) - job.games
+                job.individuals += individuals
+                job.games += games
+                if self.on_progress:
+                    self.on_progress(job, individuals, games)
+                job.progress.publish(job.state)
+        except EOFError:
+            pass
+        finally:
+            receiver.close()
+        job.process.join()
+
+        if final is None:
+            if job.state.get("cancel_requested"):
+                final = {"status": CANCELLED}
+            else:
+                final = {"status": ERROR, "message": f"Training process exited with code {job.process.exitcode}"}
+        else:
+            weights = final.pop("weights", None)
+            if weights is not None and self.on_complete:
+                self.on_complete(np.array(weights))
+
+        with self._lock:
+            self._finish(job, final)
+        self._start_queued()
+
+    def _finish(self, job: TrainingJob, final: Dict):
+        job.state.update(final)
+        job.state.pop("cancel_requested", None)
+        job.finished = time.time()
+        job.progress.publish(job.state, final=True)
+        if self.release is not None and not self.unfinished():
+            self.release()
@@ -0,0 +1,341 @@
+"""Websocket load generator and latency soak test for a local backend.
+
+Opens concurrent /ai-move and /ai-suggest clients. Every client sends the
+same messages as the frontend (--next-piece adds next_piece_type) and
+plays its own seeded GameState game with the moves the server answers,
+sending the next position as soon as the previous reply arrives (or after
+--think-ms), and a new seeded game starts when one ends. Throughput and
+p50/p95/p99 latency per endpoint are printed every --interval seconds and
+for the whole run.
+
+Several --clients values are run one after another, so a single run shows
+where latency starts to climb. With --train a training job (the one /train
+starts) runs on the server during the test and is cancelled at the end.
+With --spawn the server is started here on a free port, in a temporary
+directory, so training never replaces the real weights. --max-p99-ms
+fails the run (exit code 1) when an endpoint's p99 goes above it.
+
+    python loadtest.py --spawn --clients 4 8 16 --duration 30
+    python loadtest.py --url ws://127.0.0.1:8000 --clients 8 --train
+    python loadtest.py --spawn --output load.json --max-p99-ms 250
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+import numpy as np
+import websockets
+
+from game_engine import GameState, Piece
+
+SEED = 1234
+ENDPOINTS = ['/ai-move', '/ai-suggest']
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class LoadTestError(Exception):
+    pass
+
+
+class LatencyStats:
+    """Reply latencies per endpoint, for the current window and the whole level"""
+
+    def __init__(self, endpoints: List[str]):
+        self.window: Dict[str, List[float]] = {endpoint: [] for endpoint in endpoints}
+        self.total: Dict[str, List[float]] = {endpoint: [] for endpoint in endpoints}
+        self.window_errors = dict.fromkeys(endpoints, 0)
+        self.errors = dict.fromkeys(endpoints, 0)
+        self.games = 0
+
+    def record(self, endpoint: str, seconds: float):
+        self.window[endpoint].append(seconds)
+        self.total[endpoint].append(seconds)
+
+    def error(self, endpoint: str):
+        self.window_errors[endpoint] += 1
+        self.errors[endpoint] += 1
+
+    def take_window(self, elapsed: float) -> Dict[str, Dict]:
+        summary = {
+            endpoint: summarize(latencies, self.window_errors[endpoint], elapsed)
+            for endpoint, latencies in self.window.items()
+        }
+        for endpoint in self.window:
+            self.window[endpoint] = []
+            self.window_errors[endpoint] = 0
+        return summary
+
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        return {
+            endpoint: summarize(latencies, self.errors[endpoint], elapsed)
+            for endpoint, latencies in self.total.items()
+        }
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    summary = {'requests': len(latencies), 'errors': errors, 'rate': len(latencies) / max(elapsed, 1e-9)}
+    if latencies:
+        p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+        summary.update(p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99),
+                       max_ms=max(latencies) * 1000)
+    return summary
+
+
+def format_summary(endpoint: str, summary: Dict) -> str:
+    line = f"{endpoint:11s} {summary['rate']:7.1f} req/s"
+    if summary['requests']:
+        line += (f"  p50 {summary['p50_ms']:6.1f} ms  p95 {summary['p95_ms']:6.1f} ms"
+                 f"  p99 {summary['p99_ms']:6.1f} ms")
+    if summary['errors']:
+        line += f"  {summary['errors']} errors"
+    return line
+
+
+def game_message(game: GameState, endpoint: str, next_piece: bool = False) -> Dict:
+    """The JSON message the frontend (fe/src/utils/api.js) sends for a position.
+
+    The frontend never sends next_piece_type, so lookahead searches average
+    over every piece; next_piece adds it, for the cheaper known-piece path.
+    """
+    piece = game.current_piece
+    message = {
+        'board': game.board.tolist(),
+        'current_piece': {'type': piece.key, 'rotation': piece.rotation, 'x': piece.x, 'y': piece.y}
+    }
+    if endpoint == '/ai-suggest':
+        message.update(score=game.score, lines=game.lines, level=game.level)
+    if next_piece:
+        message['next_piece_type'] = game.next_piece_type
+    return message
+
+
+def reply_move(endpoint: str, reply: Dict) -> Optional[Dict]:
+    if 'error' in reply:
+        return None
+    return reply if endpoint == '/ai-move' else reply['best_move']
+
+
+async def run_client(
+    url: str,
+    endpoint: str,
+    seed: int,
+    seed_step: int,
+    stats: LatencyStats,
+    deadline: float,
+    think: float,
+    next_piece: bool
+):
+    """Play seeded games against one endpoint until the deadline"""
+    game = GameState(seed=seed)
+    while time.monotonic() < deadline:
+        try:
+            async with websockets.connect(url + endpoint, max_size=None) as ws:
+                while time.monotonic() < deadline:
+                    start = time.perf_counter()
+                    await ws.send(json.dumps(game_message(game, endpoint, next_piece)))
+                    reply = json.loads(await ws.recv())
+                    stats.record(endpoint, time.perf_counter() - start)
+
+                    move = reply_move(endpoint, reply)
+                    piece = None
+                    if move is not None:
+                        piece = Piece.at(game.current_piece.key, move['rotation'], move['column'], move['final_y'])
+                        if not game.is_valid_position(piece):
+                            stats.error(endpoint)
+                            piece = None
+                    if piece is not None:
+                        game.lock_piece(piece)
+                    if piece is None or game.game_over:
+                        # Next game of this client, seeds never repeat between clients
+                        seed += seed_step
+                        game = GameState(seed=seed)
+                        stats.games += 1
+                    if think:
+                        await asyncio.sleep(think)
+        except (OSError, websockets.WebSocketException):
+            stats.error(endpoint)
+            await asyncio.sleep(0.5)
+
+
+def http_json(method: str, url: str, timeout: float = 10.0) -> Dict:
+    request = urllib.request.Request(url, method=method)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def wait_for_server(http_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return http_json('GET', http_url + '/health', timeout=2.0)
+        except (OSError, urllib.error.URLError):
+            if time.monotonic() > deadline:
+                raise LoadTestError(f"No server answering at {http_url}")
+            time.sleep(0.25)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(port: int, workers: int) -> tuple:
+    """Start uvicorn in a temporary directory holding a copy of the weights.
+
+    The server's progress prints are dropped so they don't interleave with
+    the report, warnings and errors still reach stderr.
+    """
+    workdir = tempfile.mkdtemp(prefix='tetris-loadtest-')
+    for name in ('best_weights.npy', 'best_weights.cix'):
+        if os.path.exists(os.path.join(HERE, name)):
+            shutil.copy(os.path.join(HERE, name), workdir)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--app-dir', HERE,
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=workdir, stdout=subprocess.DEVNULL
+    )
+    return process, workdir
+
+
+async def run_level(args, url: str, http_url: str, clients: int, job_id: Optional[str]) -> Dict:
+    """Run one concurrency level, return its timeline and summary"""
+    stats = LatencyStats(args.endpoints)
+    started = time.monotonic()
+    deadline = started + args.duration
+    tasks = [
+        asyncio.create_task(run_client(
+            url, args.endpoints[i % len(args.endpoints)], args.seed + i, clients,
+            stats, deadline, args.think_ms / 1000, args.next_piece
+        ))
+        for i in range(clients)
+    ]
+
+    timeline = []
+    window_start = started
+    print(f"\n{clients} clients for {args.duration:.0f}s")
+    while not all(task.done() for task in tasks):
+        now = time.monotonic()
+        # Past the deadline the last window ends when every client has its last reply
+        timeout = max(0.0, min(window_start + args.interval, deadline) - now) if now < deadline else None
+        await asyncio.wait(tasks, timeout=timeout)
+        now = time.monotonic()
+        if not all(task.done() for task in tasks) and (now >= deadline or now - window_start < args.interval):
+            continue
+        window = {'time': round(now - started, 2), 'endpoints': stats.take_window(now - window_start)}
+        if job_id is not None:
+            job = await asyncio.to_thread(http_json, 'GET', f"{http_url}/jobs/{job_id}")
+            window['training'] = {'status': job['status'], 'progress': job['progress']}
+        timeline.append(window)
+        window_start = now
+
+        training = f"  [training {window['training']['status']} {window['training']['progress']}%]" \
+            if 'training' in window else ''
+        for i, endpoint in enumerate(args.endpoints):
+            prefix = f"{window['time']:6.1f}s" if i == 0 else ' ' * 7
+            print(f"{prefix} {format_summary(endpoint, window['endpoints'][endpoint])}{training if i == 0 else ''}")
+    for task in tasks:
+        task.result()
+
+    summary = stats.summary(time.monotonic() - started)
+    print(f"{clients} clients, {stats.games} games finished:")
+    for endpoint in args.endpoints:
+        print(f"  {format_summary(endpoint, summary[endpoint])}")
+    return {'clients': clients, 'games': stats.games, 'timeline': timeline, 'summary': summary}
+
+
+async def run_load_test(args, url: str, http_url: str) -> List[Dict]:
+    health = await asyncio.to_thread(wait_for_server, http_url, 60.0)
+    print(f"Server weights {health['weights_id']}, worker pid {health['worker_pid']}")
+
+    job_id = None
+    if args.train:
+        params = f"generations={args.train_generations}&population_size={args.train_population}"
+        job_id = (await asyncio.to_thread(http_json, 'POST', f"{http_url}/jobs?{params}"))['id']
+        print(f"Training job {job_id} queued")
+
+    try:
+        return [await run_level(args, url, http_url, clients, job_id) for clients in args.clients]
+    finally:
+        if job_id is not None:
+            try:
+                await asyncio.to_thread(http_json, 'DELETE', f"{http_url}/jobs/{job_id}")
+                print(f"Training job {job_id} cancelled")
+            except urllib.error.HTTPError:
+                # Already finished
+                pass
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Websocket load test for the Tetris AI backend")
+    parser.add_argument('--url', default='ws://127.0.0.1:8000', help="server websocket base URL")
+    parser.add_argument('--spawn', action='store_true', help="start a server for the test instead of using --url")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn workers of a spawned server")
+    parser.add_argument('--clients', type=int, nargs='+', default=[8],
+                        help="concurrent clients, several values run one after another (default 8)")
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS,
+                        help="endpoints the clients are spread over")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds per --clients value")
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds between reports")
+    parser.add_argument('--think-ms', type=float, default=0.0, help="pause of a client between replies")
+    parser.add_argument('--next-piece', action='store_true',
+                        help="also send next_piece_type, which the frontend doesn't")
+    parser.add_argument('--seed', type=int, default=SEED, help="seed of the first client's first game")
+    parser.add_argument('--train', action='store_true', help="run a training job during the test")
+    parser.add_argument('--train-generations', type=int, default=30)
+    parser.add_argument('--train-population', type=int, default=40)
+    parser.add_argument('--output', help="write the timeline and summaries as JSON to this file")
+    parser.add_argument('--max-p99-ms', type=float, help="fail when an endpoint's p99 latency is above this")
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    server = workdir = None
+    if args.spawn:
+        port = free_port()
+        url = f"ws://127.0.0.1:{port}"
+        server, workdir = spawn_server(port, args.workers)
+        print(f"Started server on port {port} (pid {server.pid}) in {workdir}")
+    http_url = 'http' + url[len('ws'):]
+
+    try:
+        levels = asyncio.run(run_load_test(args, url, http_url))
+    except LoadTestError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'url': url, 'endpoints': args.endpoints, 'duration': args.duration, 'levels': levels},
+                      f, indent=2)
+
+    if args.max_p99_ms is not None:
+        failed = [
+            f"{level['clients']} clients {endpoint}"
+            for level in levels
+            for endpoint, summary in level['summary'].items()
+            if summary.get('p99_ms', 0.0) > args.max_p99_ms
+        ]
+        if failed:
+            print(f"❌ p99 above {args.max_p99_ms:.0f} ms: {', '.join(failed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,31 @@
 # be/main.py
 """FastAPI server for Tetris AI"""
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np
-import threading
-import queue
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 import json
-from game_engine import GameState, Piece, TETROMINOS
+import multiprocessing
+import tempfile
+import uuid
+import time
+from game_engine import GameState, weights_id
 from ai_engine import TetrisAI
+from metrics import REGISTRY
+from search_pool import LatestWins, SearchPool
+from jobs import JobManager, TrainingBusyError, TrainingJob
+from trainer import OPTIMIZERS
+from session import GameSession, SessionError
+from replay import GameRecord
+from weights_store import WeightsStore
+from contour_index import ContourIndex, ContourIndexError, index_path
+import analysis
+import protocol
 import os
+from typing import Optional
 
 app = FastAPI(title="Tetris AI API", version="1.0.0")
 
@@ -23,26 +38,177 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Size of the AI position cache (0 disables it)
+AI_CACHE_SIZE = int(os.environ.get("AI_CACHE_SIZE", "4096"))
+
+# Lookahead search defaults, overridable per message. Depth 1 (greedy) is
+# the default, lookahead is opt-in: a client that doesn't send
+# next_piece_type makes every deeper search average over all 7 pieces
+AI_SEARCH_DEPTH = int(os.environ.get("AI_SEARCH_DEPTH", "1"))
+AI_MAX_SEARCH_DEPTH = int(os.environ.get("AI_MAX_SEARCH_DEPTH", "3"))
+AI_BEAM_WIDTH = int(os.environ.get("AI_BEAM_WIDTH", "5"))
+AI_MAX_BEAM_WIDTH = int(os.environ.get("AI_MAX_BEAM_WIDTH", "10"))
+AI_TIME_BUDGET_MS = float(os.environ.get("AI_TIME_BUDGET_MS", "100"))
+AI_MAX_TIME_BUDGET_MS = float(os.environ.get("AI_MAX_TIME_BUDGET_MS", "1000"))
+
+# "drop" scores hard drops only, "reachable" also tucks and spins
+AI_MOVE_GENERATOR = os.environ.get("AI_MOVE_GENERATOR", "drop")
+
+# Weights shared by every worker process (uvicorn --workers N); each worker
+# checks the store's generation every interval and swaps in new weights
+AI_WEIGHTS_STORE = os.environ.get("AI_WEIGHTS_STORE", "best_weights.store")
+AI_WEIGHTS_POLL_INTERVAL = float(os.environ.get("AI_WEIGHTS_POLL_INTERVAL", "0.5"))
+
 # Load or initialize AI
 try:
     weights = np.load("best_weights.npy", allow_pickle=True).flatten()
-    ai = TetrisAI(weights)
+    weights_mtime = os.path.getmtime("best_weights.npy")
     print(f"✅ Loaded trained weights: {weights}")
 except:
-    ai = TetrisAI()  # Use default weights
+    weights = TetrisAI().weights  # Use default weights
+    weights_mtime = 0.0
     print("⚠️ Using default AI weights")
+weights_store = WeightsStore(AI_WEIGHTS_STORE)
+ai = TetrisAI(
+    weights_store.initialize(weights, weights_mtime),
+    cache_size=AI_CACHE_SIZE,
+    move_generator=AI_MOVE_GENERATOR
+)
+print(f"✅ Serving weights version {weights_store.version}: {ai.weights}")
+
+# Precomputed greedy moves (see contour_index.py); empty disables the index.
+# It answers depth-1 best-move searches only (it holds the best move, not a
+# ranking that suggestions or a lookahead could start from), so training
+# jobs rebuild it only when depth 1 is the server default
+AI_CONTOUR_INDEX = os.environ.get("AI_CONTOUR_INDEX", index_path("best_weights.npy"))
+
+def load_contour_index():
+    """Use the index file if it was built for the weights being served"""
+    if not AI_CONTOUR_INDEX or not os.path.exists(AI_CONTOUR_INDEX):
+        return
+    try:
+        ai.set_contour_index(ContourIndex(AI_CONTOUR_INDEX))
+    except ContourIndexError as e:
+        print(f"⚠️ Ignoring contour index: {e}")
+
+load_contour_index()
+
+# Training jobs run in child processes, at most TRAINING_MAX_JOBS at once;
+# progress events reach each client at most once per interval
+TRAINING_MAX_JOBS = int(os.environ.get("TRAINING_MAX_JOBS", "1"))
+TRAINING_PROGRESS_INTERVAL = float(os.environ.get("TRAINING_PROGRESS_INTERVAL", "0.25"))
+
+# Metrics
+REQUEST_SECONDS = REGISTRY.histogram(
+    "tetris_ai_request_seconds", "AI websocket message latency by phase", ["endpoint", "phase"]
+)
+PLACEMENTS_EVALUATED = REGISTRY.histogram(
+    "tetris_ai_placements_evaluated", "Placements scored per AI message", ["endpoint"],
+    buckets=(0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
+ACTIVE_CONNECTIONS = REGISTRY.gauge(
+    "tetris_websocket_connections", "Open AI websocket connections", ["endpoint"]
+)
+TRAINING_LISTENERS = REGISTRY.gauge("tetris_training_listeners", "Clients streaming /train progress")
+TRAINING_INDIVIDUALS = REGISTRY.counter("tetris_training_individuals_total", "Individuals evaluated by training")
+TRAINING_GAMES = REGISTRY.counter("tetris_training_games_total", "Games simulated by training")
+TRAINING_INDIVIDUALS_RATE = REGISTRY.gauge("tetris_training_individuals_per_second", "Training throughput of the current run")
+TRAINING_GAMES_RATE = REGISTRY.gauge("tetris_training_games_per_second", "Training throughput of the current run")
+EVENT_LOOP_LAG = REGISTRY.histogram("tetris_event_loop_lag_seconds", "Delay of a periodic event loop tick")
+SEARCH_PENDING = REGISTRY.gauge("tetris_ai_searches_running", "AI searches submitted to the worker pool")
+WEIGHTS_RELOADS = REGISTRY.counter("tetris_ai_weights_reloads_total", "New weights swapped in from the shared store")
+SESSION_RESYNCS = REGISTRY.counter("tetris_ai_session_resyncs_total", "AI session resyncs requested from clients")
+DROPPED_REQUESTS = REGISTRY.counter(
+    "tetris_ai_dropped_requests_total", "Stale AI requests replaced by a newer state", ["endpoint"]
+)
+
+# AI searches run on worker threads so they don't block the event loop
+search_pool = SearchPool(
+    workers=int(os.environ.get("AI_SEARCH_WORKERS", str(os.cpu_count() or 1))),
+    max_pending=int(os.environ.get("AI_MAX_PENDING_SEARCHES", "64"))
+)
+
+# Directory for /ai-session game recordings, unset disables recording
+AI_RECORD_DIR = os.environ.get("AI_RECORD_DIR")
+
+# Bulk /analyze batches run in worker processes, created on first use;
+# spawned rather than forked since the server already runs threads
+AI_ANALYSIS_WORKERS = int(os.environ.get("AI_ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+ANALYSIS_SPOOL_BYTES = 8 * 1024 * 1024
+# Largest batch_size a client may ask for, batches are held in memory
+ANALYSIS_MAX_BATCH_SIZE = int(os.environ.get("ANALYSIS_MAX_BATCH_SIZE", str(analysis.MAX_BATCH_SIZE)))
+analysis_pool = None
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    global analysis_pool
+    if analysis_pool is None:
+        analysis_pool = ProcessPoolExecutor(
+            max_workers=AI_ANALYSIS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return analysis_pool
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Measure how late the event loop runs a periodic tick"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+@app.on_event("shutdown")
+def stop_training_jobs():
+    training_jobs.shutdown()
+
+@app.on_event("shutdown")
+def stop_analysis_pool():
+    if analysis_pool is not None:
+        analysis_pool.shutdown(cancel_futures=True)
+
+def refresh_weights():
+    """Swap in weights published to the store since this worker last looked"""
+    weights = weights_store.poll()
+    if weights is not None:
+        ai.set_weights(weights)
+        load_contour_index()
+        WEIGHTS_RELOADS.inc()
+
+def publish_weights(weights: np.ndarray):
+    """Hand trained weights to every worker"""
+    weights_store.publish(weights)
+    refresh_weights()
+
+async def watch_weights(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        refresh_weights()
+
+@app.on_event("startup")
+async def start_event_loop_monitor():
+    asyncio.create_task(monitor_event_loop())
+
+@app.on_event("startup")
+async def start_weights_watcher():
+    asyncio.create_task(watch_weights(AI_WEIGHTS_POLL_INTERVAL))
+
+
+def clamp_search(depth: int, beam_width: int, time_budget_ms: float) -> dict:
+    """Search options bounded by the server limits; a budget that isn't
+    positive falls back to the server default"""
+    if not time_budget_ms > 0:
+        time_budget_ms = AI_TIME_BUDGET_MS
+    return {
+        "depth": min(max(depth, 1), AI_MAX_SEARCH_DEPTH),
+        "beam_width": min(max(beam_width, 1), AI_MAX_BEAM_WIDTH),
+        "time_budget_ms": min(time_budget_ms, AI_MAX_TIME_BUDGET_MS)
+    }
 
-# Global training state
-training_state = {
-    "is_training": False,
-    "progress": 0,
-    "generation": 0,
-    "best_score": 0,
-    "message": "Idle"
-}
-listeners = []
-listeners_lock = threading.Lock()
-training_thread = None
+def search_options(data: dict) -> dict:
+    """Lookahead options from a client message, falling back to server defaults"""
+    return clamp_search(
+        int(data.get("depth", AI_SEARCH_DEPTH)),
+        int(data.get("beam_width", AI_BEAM_WIDTH)),
+        float(data.get("time_budget_ms", AI_TIME_BUDGET_MS))
+    )
 
 @app.get("/")
 def root():
@@ -52,193 +218,405 @@ def root():
         "endpoints": [
             "/ai-suggest - Get AI suggestions (WebSocket)",
             "/ai-move - Get best AI move (WebSocket)",
-            "/health - Health check"
+            "/ai-session - AI moves for a server-side game updated by deltas (WebSocket)",
+            "/analyze - Bulk position analysis, streamed NDJSON results (POST)",
+            "/jobs - Training jobs: POST to queue, GET status, DELETE to cancel",
+            "/jobs/{id}/events - Training job progress (SSE)",
+            "/health - Health check",
+            "/metrics - Prometheus metrics"
         ]
     }
 
-@app.websocket("/ai-move")
-async def ai_move(websocket: WebSocket):
-    await websocket.accept()
-    try:
-        while True:
-            # Receive game state from client
-            data = await websocket.receive_json()
-
-            # Create a GameState object from the received data
-            game = GameState()
-            game.board = np.array(data['board'], dtype=int)
-
-            piece_data = data['current_piece']
-            game.current_piece = Piece(
-                piece_data['type'],
-                piece_data['rotation'],
-                piece_data['x'],
-                piece_data['y']
-            )
+def record_search(
+    endpoint: str,
+    parse_time: float,
+    queue_time: float,
+    search_time: float,
+    send_time: float,
+    placements: int
+):
+    REQUEST_SECONDS.observe(parse_time, endpoint=endpoint, phase="parse")
+    REQUEST_SECONDS.observe(queue_time, endpoint=endpoint, phase="queue")
+    REQUEST_SECONDS.observe(search_time, endpoint=endpoint, phase="search")
+    REQUEST_SECONDS.observe(send_time, endpoint=endpoint, phase="send")
+    REQUEST_SECONDS.observe(
+        parse_time + queue_time + search_time + send_time, endpoint=endpoint, phase="total"
+    )
+    PLACEMENTS_EVALUATED.observe(placements, endpoint=endpoint)
+
+def best_move_response(game: GameState, options: dict) -> dict:
+    # Get the best move from the AI
+    best_move = ai.get_best_move(game, **options)
+
+    if not best_move:
+        return {"error": "No valid moves"}
+    return {
+        "rotation": best_move["rotation"],
+        "column": best_move["column"],
+        "final_y": best_move["final_y"]
+    }
+
+def suggestions_response(game: GameState, options: dict) -> dict:
+    # Get suggestions
+    suggestions = ai.get_all_suggestions(game, top_k=3, **options)
+
+    if not suggestions:
+        return {"error": "No valid moves available"}
+
+    # Determine confidence based on score distribution
+    if len(suggestions) > 1:
+        score_diff = suggestions[0]['score'] - suggestions[1]['score']
+        if score_diff > 50:
+            confidence = "high"
+        elif score_diff > 20:
+            confidence = "medium"
+        else:
+            confidence = "low"
+    else:
+        confidence = "high"
 
-            # Get the best move from the AI
-            best_move = ai.get_best_move(game)
+    return {
+        "best_move": suggestions[0],
+        "alternatives": suggestions[1:],
+        "confidence": confidence
+    }
 
-            if not best_move:
-                await websocket.send_json({"error": "No valid moves"})
+def run_search(respond, game: GameState, options: dict):
+    """Worker thread side of a request: response, search time and placements scored"""
+    start = time.perf_counter()
+    response = respond(game, options)
+    return response, time.perf_counter() - start, ai.take_placement_count()
+
+async def serve_ai(websocket: WebSocket, endpoint: str, name: str, respond, encode_binary):
+    """Answer AI requests on a websocket, searching on the worker pool.
+
+    Messages are read by a separate task into a latest-wins mailbox, so a
+    state sent while the previous one is still waiting for a worker
+    replaces it and only the newest state is searched. Clients that offer
+    the binary subprotocol exchange compact binary messages instead of JSON.
+    """
+    binary = protocol.SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=protocol.SUBPROTOCOL if binary else None)
+    receive_message = websocket.receive_bytes if binary else websocket.receive_text
+    ACTIVE_CONNECTIONS.inc(endpoint=endpoint)
+    mailbox = LatestWins()
+    dropped = 0
+
+    async def receive():
+        try:
+            while True:
+                mailbox.put(await receive_message())
+        except WebSocketDisconnect:
+            print(f"{name} client disconnected")
+        except Exception as e:
+            print(f"Error in {name}: {e}")
+        finally:
+            mailbox.close()
+
+    reader = asyncio.create_task(receive())
+    try:
+        while True:
+            message = await mailbox.get()
+            if message is None:
+                break
+
+            async with search_pool.slots:
+                # A newer state arrived while waiting for a worker
+                if mailbox.has_item():
+                    message = mailbox.take()
+                DROPPED_REQUESTS.inc(mailbox.dropped - dropped, endpoint=endpoint)
+                dropped = mailbox.dropped
+
+                start = time.perf_counter()
+                data = protocol.decode_request(message) if binary else json.loads(message)
+                game = protocol.parse_game(data)
+                parsed = time.perf_counter()
+
+                response, search_time, placements = await search_pool.submit(
+                    run_search, respond, game, search_options(data)
+                )
+                searched = time.perf_counter()
+
+            if binary:
+                await websocket.send_bytes(encode_binary(response))
             else:
-                await websocket.send_json({
-                    "rotation": best_move["rotation"],
-                    "column": best_move["column"],
-                    "final_y": best_move["final_y"]
-                })
+                await websocket.send_text(protocol.encode_json(response))
+            record_search(
+                endpoint, parsed - start, searched - parsed - search_time,
+                search_time, time.perf_counter() - searched, placements
+            )
 
     except WebSocketDisconnect:
-        print("AI move stream client disconnected")
+        print(f"{name} client disconnected")
     except Exception as e:
-        print(f"Error in AI move stream: {e}")
-        await websocket.send_json({"error": str(e)})
+        print(f"Error in {name}: {e}")
+        if binary:
+            await websocket.send_bytes(protocol.encode_error(str(e)))
+        else:
+            await websocket.send_text(protocol.encode_json({"error": str(e)}))
+    finally:
+        reader.cancel()
+        ACTIVE_CONNECTIONS.dec(endpoint=endpoint)
+
+@app.websocket("/ai-move")
+async def ai_move(websocket: WebSocket):
+    await serve_ai(
+        websocket, "/ai-move", "AI move stream",
+        best_move_response, protocol.encode_move_response
+    )
 
 
 @app.websocket("/ai-suggest")
 async def ai_suggest(websocket: WebSocket):
+    await serve_ai(
+        websocket, "/ai-suggest", "AI suggest stream",
+        suggestions_response, protocol.encode_suggestions_response
+    )
+
+def save_recording(record: GameRecord):
+    """Write a finished /ai-session game to AI_RECORD_DIR"""
+    os.makedirs(AI_RECORD_DIR, exist_ok=True)
+    name = f"session-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.trpl"
+    record.save(os.path.join(AI_RECORD_DIR, name))
+
+SESSION_RESPONSES = {"move": best_move_response, "suggest": suggestions_response}
+
+@app.websocket("/ai-session")
+async def ai_session(websocket: WebSocket):
+    """AI moves for a game kept on the server, updated by client deltas.
+
+    Unlike /ai-move every message is applied in order (a skipped delta
+    would desync the board), so there is no latest-wins dropping here. The
+    reply carries the server's board hash and, unless "respond" is "none",
+    the AI answer for the updated position.
+    """
+    endpoint = "/ai-session"
     await websocket.accept()
+    ACTIVE_CONNECTIONS.inc(endpoint=endpoint)
+    session = GameSession(save_recording if AI_RECORD_DIR else None, weights_id(ai.weights))
     try:
         while True:
-            # Receive game state from client
-            data = await websocket.receive_json()
-
-            # Create a GameState object from the received data
-            game = GameState()
-            game.board = np.array(data['board'], dtype=int)
-            game.score = data.get('score', 0)
-            game.lines = data.get('lines', 0)
-            game.level = data.get('level', 1)
-
-            piece_data = data['current_piece']
-            game.current_piece = Piece(
-                piece_data['type'],
-                piece_data['rotation'],
-                piece_data['x'],
-                piece_data['y']
+            text = await websocket.receive_text()
+            start = time.perf_counter()
+            data = json.loads(text)
+            try:
+                in_sync = session.apply(data)
+            except (SessionError, KeyError, ValueError, TypeError) as e:
+                await websocket.send_text(protocol.encode_json({"error": f"Bad session message: {e}"}))
+                continue
+            parsed = time.perf_counter()
+
+            if not in_sync:
+                SESSION_RESYNCS.inc()
+                await websocket.send_text(protocol.encode_json({"resync": True, "hash": session.hash}))
+                continue
+
+            game = session.game
+            reply = {"hash": session.hash}
+            if game.game_over:
+                reply["game_over"] = True
+                await websocket.send_text(protocol.encode_json(reply))
+                continue
+
+            respond = SESSION_RESPONSES.get(data.get("respond", "move"))
+            if respond is None:
+                await websocket.send_text(protocol.encode_json(reply))
+                continue
+
+            async with search_pool.slots:
+                response, search_time, placements = await search_pool.submit(
+                    run_search, respond, game, search_options(data)
+                )
+                searched = time.perf_counter()
+            reply.update(response)
+            await websocket.send_text(protocol.encode_json(reply))
+            record_search(
+                endpoint, parsed - start, searched - parsed - search_time,
+                search_time, time.perf_counter() - searched, placements
             )
 
-            # Get suggestions
-            suggestions = ai.get_all_suggestions(game, top_k=3)
-
-            if not suggestions:
-                await websocket.send_json({"error": "No valid moves available"})
-            else:
-                # Determine confidence based on score distribution
-                if len(suggestions) > 1:
-                    score_diff = suggestions[0]['score'] - suggestions[1]['score']
-                    if score_diff > 50:
-                        confidence = "high"
-                    elif score_diff > 20:
-                        confidence = "medium"
-                    else:
-                        confidence = "low"
-                else:
-                    confidence = "high"
-
-                await websocket.send_json({
-                    "best_move": suggestions[0],
-                    "alternatives": suggestions[1:],
-                    "confidence": confidence
-                })
-
     except WebSocketDisconnect:
-        print("AI suggest stream client disconnected")
+        print("AI session client disconnected")
     except Exception as e:
-        print(f"Error in AI suggest stream: {e}")
-        await websocket.send_json({"error": str(e)})
+        print(f"Error in AI session: {e}")
+        await websocket.send_text(protocol.encode_json({"error": str(e)}))
+    finally:
+        session.close()
+        ACTIVE_CONNECTIONS.dec(endpoint=endpoint)
+
+@app.post("/analyze")
+async def analyze(
+    request: Request,
+    top_k: int = 3,
+    depth: int = 1,
+    beam_width: int = AI_BEAM_WIDTH,
+    time_budget_ms: float = AI_TIME_BUDGET_MS,
+    batch_size: int = analysis.BATCH_SIZE
+):
+    """Analyze an uploaded batch of positions, streaming NDJSON results.
+
+    The body is NDJSON positions, or binary protocol requests when sent as
+    application/octet-stream. See analysis.py for the formats. batch_size
+    is capped at ANALYSIS_MAX_BATCH_SIZE.
+    """
+    binary = request.headers.get("content-type", "").startswith("application/octet-stream")
+
+    # The body can't be read while the response streams, so spool it first
+    # (in memory up to a limit, then on disk)
+    upload = tempfile.SpooledTemporaryFile(max_size=ANALYSIS_SPOOL_BYTES)
+    async for chunk in request.stream():
+        upload.write(chunk)
+    upload.seek(0)
+
+    async def read_upload():
+        try:
+            while chunk := upload.read(1 << 16):
+                yield chunk
+        finally:
+            upload.close()
+
+    results = analysis.analyze_stream_async(
+        read_upload(),
+        get_analysis_pool(),
+        ai.weights.tolist(),
+        binary=binary,
+        batch_size=min(max(1, batch_size), ANALYSIS_MAX_BATCH_SIZE),
+        max_in_flight=max(analysis.MAX_IN_FLIGHT, 2 * AI_ANALYSIS_WORKERS),
+        top_k=top_k,
+        **clamp_search(depth, beam_width, time_budget_ms)
+    )
+    return StreamingResponse(results, media_type="application/x-ndjson")
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of server metrics"""
+    TRAINING_LISTENERS.set(sum(job.progress.listeners for job in training_jobs.list()))
+    SEARCH_PENDING.set(search_pool.pending)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 def health_check():
     return {
         "status": "healthy",
         "ai_loaded": ai is not None,
-        "weights": ai.weights.tolist() if ai else None
+        "weights": ai.weights.tolist() if ai else None,
+        "weights_version": weights_store.version,
+        "weights_id": weights_id(ai.weights).hex(),
+        "worker_pid": os.getpid(),
+        "contour_index": ai.contour_index_active,
+        "cache": ai.cache_stats() if ai else None
     }
 
-def training_worker(generations, population_size):
-    """The training logic in a thread."""
-    global ai, training_state
-
-    def callback(stats):
-        # Preserve existing state and update with new stats
-        current_stats = training_state.copy()
-        current_stats.update(stats)
-        training_state.update(current_stats)
-        with listeners_lock:
-            # Send the full, updated state to all listeners
-            for q in list(listeners):
-                q.put(current_stats)
+def record_training_progress(job: TrainingJob, individuals: int, games: int):
+    """Training throughput metrics from a job's progress messages"""
+    TRAINING_INDIVIDUALS.inc(individuals)
+    TRAINING_GAMES.inc(games)
+    elapsed = max(time.time() - job.started, 1e-9)
+    TRAINING_INDIVIDUALS_RATE.set(job.individuals / elapsed)
+    TRAINING_GAMES_RATE.set(job.games / elapsed)
+
+training_jobs = JobManager(
+    max_running=TRAINING_MAX_JOBS,
+    weights_path="best_weights.npy",
+    index_path=AI_CONTOUR_INDEX if AI_CONTOUR_INDEX and AI_SEARCH_DEPTH <= 1 else None,
+    progress_interval=TRAINING_PROGRESS_INTERVAL,
+    on_progress=record_training_progress,
+    on_complete=publish_weights,
+    # One worker trains at a time, the others answer 409 meanwhile
+    claim=weights_store.claim_training,
+    release=weights_store.release_training
+)
 
-    try:
-        from trainer import train_genetic_algorithm
-        new_weights, best_score = train_genetic_algorithm(
-            generations=generations,
-            population_size=population_size,
-            callback=callback
-        )
+def training_params(generations, population_size, workers, seed, batched, budget, optimizer) -> dict:
+    if optimizer not in OPTIMIZERS:
+        raise HTTPException(status_code=400, detail=f"Unknown optimizer: {optimizer}")
+    return {
+        "generations": generations,
+        "population_size": population_size,
+        "workers": workers,
+        "seed": seed,
+        "batched": batched,
+        "budget": budget,
+        "optimizer": optimizer
+    }
 
-        np.save("best_weights.npy", new_weights)
-        ai = TetrisAI(new_weights)
+def job_events(job: TrainingJob) -> StreamingResponse:
+    """Server-Sent Events of a job's progress"""
+    async def event_generator():
+        # The most recent state first, then throttled updates until the final one
+        async for state in job.progress.listen():
+            yield f"data: {json.dumps(state)}\n\n"
 
-        final_stats = {"status": "complete", "best_score": best_score, "progress": 100}
-        training_state.update(final_stats)
-        with listeners_lock:
-            for q in list(listeners):
-                q.put(final_stats)
-                q.put(None)  # Sentinel to close connection
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
 
-    except Exception as e:
-        error_stats = {"status": "error", "message": str(e)}
-        training_state.update(error_stats)
-        with listeners_lock:
-            for q in list(listeners):
-                q.put(error_stats)
-                q.put(None)
-    finally:
-        training_state["is_training"] = False
-        with listeners_lock:
-            listeners.clear()
+def submit_job(params: dict) -> TrainingJob:
+    try:
+        return training_jobs.submit(params)
+    except TrainingBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def find_job(job_id: str) -> TrainingJob:
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No training job {job_id}")
+    return job
+
+@app.post("/jobs")
+async def create_job(
+    generations: int = 30,
+    population_size: int = 40,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    batched: bool = False,
+    budget: Optional[int] = None,
+    optimizer: str = "ga"
+):
+    """Queue a training job, it starts when a job slot is free (409 while
+    another server worker is training)"""
+    params = training_params(generations, population_size, workers, seed, batched, budget, optimizer)
+    return submit_job(params).to_dict()
+
+@app.get("/jobs")
+def list_jobs():
+    return [job.to_dict() for job in training_jobs.list()]
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    return find_job(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    return job_events(find_job(job_id))
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = find_job(job_id)
+    if not training_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Training job {job_id} already {job.status}")
+    return job.to_dict()
 
 @app.get("/train")
-async def train(generations: int = 30, population_size: int = 40):
-    """Stream training progress using Server-Sent Events"""
-    global training_thread
-
-    # Start a new training session if none is active
-    if not training_state.get("is_training") and (training_thread is None or not training_thread.is_alive()):
-        training_state.clear()
-        training_state.update({
-            "is_training": True,
-            "progress": 0,
-            "generation": 0,
-            "best_score": 0,
-            "message": "Starting training..."
-        })
-        training_thread = threading.Thread(target=training_worker, args=(generations, population_size))
-        training_thread.start()
-
-    q = queue.Queue()
-    with listeners_lock:
-        listeners.append(q)
-
-    def event_generator():
-        try:
-            # Immediately send the most recent state to the new client
-            yield f"data: {json.dumps(training_state)}\n\n"
-
-            while True:
-                data = q.get()
-                if data is None:
-                    break
-                yield f"data: {json.dumps(data)}\n\n"
-        finally:
-            # Clean up when the client disconnects
-            with listeners_lock:
-                if q in listeners:
-                    listeners.remove(q)
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+async def train(
+    generations: int = 30,
+    population_size: int = 40,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    batched: bool = False,
+    budget: Optional[int] = None,
+    optimizer: str = "ga"
+):
+    """Stream training progress using Server-Sent Events.
+
+    Follows the running training job, or starts one if none is running
+    (409 while another server worker is training).
+    """
+    running = training_jobs.running()
+    if running:
+        job = running[0]
+    else:
+        params = training_params(generations, population_size, workers, seed, batched, budget, optimizer)
+        job = submit_job(params)
+    return job_events(job)
 
 if __name__ == "__main__":
     import uvicorn
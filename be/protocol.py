@@ -0,0 +1,208 @@
+"""Compact binary websocket protocol for the AI endpoints.
+
+Negotiated per connection with the ``tetris.bin.v1`` websocket subprotocol;
+connections that don't ask for it keep using JSON. All integers are
+little-endian.
+
+Request (34 bytes):
+    board          25 bytes, 200 cells bit-packed row by row (MSB first)
+    piece          u8  index into PIECE_TYPES
+    rotation       u8
+    x, y           i8, i8
+    next piece     u8  index into PIECE_TYPES, 255 = unknown
+    depth          u8  0 = server default
+    beam width     u8  0 = server default
+    time budget    u16 milliseconds, 0 = server default
+
+/ai-move response: status u8, rotation u8, column i8, final_y i8.
+
+/ai-suggest response: status u8, confidence u8 (0 low, 1 medium, 2 high),
+count u8, then per move rotation u8, column i8, final_y i8, score f32.
+
+Status is 0 for a move, 1 when no move is available and 2 on error, in
+which case the rest of the message is a UTF-8 error text.
+
+JSON connections get the same text send_json would produce, built by
+encode_json: moves are formatted directly and the shape and color of
+their piece come pre-encoded per (key, rotation) instead of being
+serialized again for every reply.
+"""
+
+import json
+import math
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from game_engine import (
+    BOARD_WIDTH, BOARD_HEIGHT, PIECE_INDEX, PIECE_TYPES, UNKNOWN_PIECE, GameState, Piece
+)
+
+SUBPROTOCOL = "tetris.bin.v1"
+
+CONFIDENCE_LEVELS = ["low", "medium", "high"]
+
+STATUS_OK = 0
+STATUS_NO_MOVE = 1
+STATUS_ERROR = 2
+
+BOARD_BYTES = BOARD_WIDTH * BOARD_HEIGHT // 8
+REQUEST = struct.Struct(f"<{BOARD_BYTES}sBBbbBBBH")
+MOVE = struct.Struct("<BBbb")
+SUGGEST_HEADER = struct.Struct("<BBB")
+SUGGESTION = struct.Struct("<Bbbf")
+
+# Compact separators, like starlette's send_json
+_dumps = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+MOVE_KEYS = ('rotation', 'column', 'final_y', 'score', 'depth', 'piece')
+MOVE_JSON = '{"rotation":%d,"column":%d,"final_y":%d,"score":%s,"depth":%d,"piece":%s}'
+
+
+def pack_board(board: np.ndarray) -> bytes:
+    return np.packbits(np.asarray(board) != 0).tobytes()
+
+
+def unpack_board(data: bytes) -> np.ndarray:
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=BOARD_WIDTH * BOARD_HEIGHT)
+    return bits.reshape(BOARD_HEIGHT, BOARD_WIDTH)
+
+
+def encode_request(
+    board: np.ndarray,
+    piece: str,
+    rotation: int = 0,
+    x: int = 0,
+    y: int = 0,
+    next_piece: Optional[str] = None,
+    depth: int = 0,
+    beam_width: int = 0,
+    time_budget_ms: int = 0
+) -> bytes:
+    return REQUEST.pack(
+        pack_board(board), PIECE_INDEX[piece], rotation, x, y,
+        UNKNOWN_PIECE if next_piece is None else PIECE_INDEX[next_piece],
+        depth, beam_width, time_budget_ms
+    )
+
+
+def decode_request(data: bytes) -> Dict:
+    """Binary request to the same dict shape as a JSON message"""
+    board, piece, rotation, x, y, next_piece, depth, beam_width, budget = REQUEST.unpack(data)
+    message = {
+        'board': unpack_board(board),
+        'current_piece': {'type': PIECE_TYPES[piece], 'rotation': rotation, 'x': x, 'y': y},
+        'next_piece_type': None if next_piece == UNKNOWN_PIECE else PIECE_TYPES[next_piece]
+    }
+    # Zero leaves the server default in place
+    if depth:
+        message['depth'] = depth
+    if beam_width:
+        message['beam_width'] = beam_width
+    if budget:
+        message['time_budget_ms'] = budget
+    return message
+
+
+def parse_game(data: Dict) -> GameState:
+    """GameState for a decoded JSON or binary request.
+
+    Bulk analysis positions may give ``"piece": "T"`` instead of
+    ``current_piece``; a piece without rotation or position starts at 0.
+    """
+    game = GameState()
+    game.board = np.array(data['board'], dtype=int)
+    game.score = data.get('score', 0)
+    game.lines = data.get('lines', 0)
+    game.level = data.get('level', 1)
+    if 'current_piece' in data:
+        piece_data = data['current_piece']
+        game.current_piece = Piece.at(
+            piece_data['type'],
+            piece_data.get('rotation', 0),
+            piece_data.get('x', 0),
+            piece_data.get('y', 0)
+        )
+    else:
+        game.current_piece = Piece.at(data['piece'], 0, 0, 0)
+    # Unknown next piece is averaged over all piece types
+    game.next_piece_type = data.get('next_piece_type')
+    return game
+
+
+def encode_error(message: str) -> bytes:
+    return bytes([STATUS_ERROR]) + message.encode()
+
+
+def encode_move_response(response: Dict) -> bytes:
+    if 'error' in response:
+        return bytes([STATUS_NO_MOVE])
+    return MOVE.pack(STATUS_OK, response['rotation'], response['column'], response['final_y'])
+
+
+def decode_move_response(data: bytes) -> Dict:
+    if data[0] == STATUS_ERROR:
+        return {'error': data[1:].decode()}
+    if data[0] == STATUS_NO_MOVE:
+        return {'error': "No valid moves"}
+    _, rotation, column, final_y = MOVE.unpack(data)
+    return {'rotation': rotation, 'column': column, 'final_y': final_y}
+
+
+def encode_suggestions_response(response: Dict) -> bytes:
+    if 'error' in response:
+        return bytes([STATUS_NO_MOVE])
+    moves = [response['best_move']] + response['alternatives']
+    parts = [SUGGEST_HEADER.pack(STATUS_OK, CONFIDENCE_LEVELS.index(response['confidence']), len(moves))]
+    parts.extend(
+        SUGGESTION.pack(move['rotation'], move['column'], move['final_y'], move['score'])
+        for move in moves
+    )
+    return b''.join(parts)
+
+
+def decode_suggestions_response(data: bytes) -> Dict:
+    if data[0] == STATUS_ERROR:
+        return {'error': data[1:].decode()}
+    if data[0] == STATUS_NO_MOVE:
+        return {'error': "No valid moves available"}
+    _, confidence, count = SUGGEST_HEADER.unpack_from(data)
+    moves: List[Dict] = []
+    for i in range(count):
+        rotation, column, final_y, score = SUGGESTION.unpack_from(data, SUGGEST_HEADER.size + i * SUGGESTION.size)
+        moves.append({'rotation': rotation, 'column': column, 'final_y': final_y, 'score': score})
+    return {
+        'best_move': moves[0],
+        'alternatives': moves[1:],
+        'confidence': CONFIDENCE_LEVELS[confidence]
+    }
+
+
+def _encode_number(value) -> str:
+    if isinstance(value, float) and math.isfinite(value):
+        return float.__repr__(value)
+    return _dumps(value)
+
+
+def _encode_move(move: Dict) -> str:
+    if tuple(move) != MOVE_KEYS:
+        return _dumps(move)
+    piece = move['piece']
+    return MOVE_JSON % (
+        move['rotation'], move['column'], move['final_y'], _encode_number(move['score']), move['depth'],
+        Piece.at(piece['key'], piece['rotation'], piece['x'], piece['y']).to_json()
+    )
+
+
+def encode_json(response: Dict) -> str:
+    """JSON text of a response dict, with a fast path for AI moves"""
+    parts = []
+    for name, value in response.items():
+        if name == 'best_move':
+            encoded = _encode_move(value)
+        elif name == 'alternatives':
+            encoded = '[' + ','.join(map(_encode_move, value)) + ']'
+        else:
+            encoded = _dumps(value)
+        parts.append(f'{_dumps(name)}:{encoded}')
+    return '{' + ','.join(parts) + '}'
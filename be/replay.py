@@ -0,0 +1,258 @@
+"""Compact game recordings and deterministic replay.
+
+A game is stored as its seed and one byte per move, rotation << 4 | column;
+when every move is a hard drop the landing row is recomputed on replay.
+Games whose pieces don't come from GameState(seed) (server sessions, where
+the client draws them) store the piece of every move as well, and games
+played with tucks and spins store the landing row of every move.
+
+File layout (little-endian):
+    header   magic "TRPL", version u8, flags u8, seed u64, weights id 8 bytes,
+             move count u32
+    moves    count bytes
+    pieces   count bytes, index into PIECE_TYPES (only with FLAG_PIECES)
+    rows     count bytes, landing row of the move (only with FLAG_ROWS)
+
+Positions can be appended to a flat dataset of POSITION_DTYPE records and
+read back with numpy.memmap.
+
+    python replay.py game.trpl --move 120
+    python replay.py recordings/*.trpl --dataset positions.dat
+"""
+
+import argparse
+import struct
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from game_engine import (
+    BOARD_HEIGHT, BOARD_WIDTH, PIECE_INDEX, PIECE_TYPES, PLACEMENT_TABLE,
+    UNKNOWN_PIECE, BitboardGameState, Piece, landing_row
+)
+
+MAGIC = b"TRPL"
+VERSION = 1
+FLAG_PIECES = 1
+FLAG_ROWS = 2
+HEADER = struct.Struct("<4sBBQ8sI")
+
+# One record per position: the board before the move, the pieces and the move made
+POSITION_DTYPE = np.dtype([
+    ('rows', '<u2', (BOARD_HEIGHT,)),
+    ('piece', 'u1'),
+    ('next_piece', 'u1'),
+    ('move', 'u1'),
+    ('move_index', '<u2'),
+    ('game', '<u4'),
+])
+
+
+class ReplayError(Exception):
+    pass
+
+
+@dataclass
+class GameRecord:
+    seed: int
+    weights_id: bytes = bytes(8)
+    moves: List[Tuple[int, int]] = field(default_factory=list)  # (rotation, column)
+    pieces: Optional[List[str]] = None  # piece of every move, when not seeded
+    rows: Optional[List[int]] = None  # landing row of every move, when not all hard drops
+
+    def add(self, piece: Piece):
+        self.moves.append((piece.rotation, piece.x))
+        if self.pieces is not None:
+            self.pieces.append(piece.key)
+        if self.rows is not None:
+            self.rows.append(piece.y)
+
+    def to_bytes(self) -> bytes:
+        flags = (FLAG_PIECES if self.pieces is not None else 0) | (FLAG_ROWS if self.rows is not None else 0)
+        parts = [
+            HEADER.pack(MAGIC, VERSION, flags, self.seed, self.weights_id, len(self.moves)),
+            bytes(rotation << 4 | column for rotation, column in self.moves)
+        ]
+        if self.pieces is not None:
+            parts.append(bytes(PIECE_INDEX[key] for key in self.pieces))
+        if self.rows is not None:
+            parts.append(bytes(self.rows))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GameRecord':
+        magic, version, flags, seed, wid, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or flags & ~(FLAG_PIECES | FLAG_ROWS):
+            raise ReplayError("Not a version 1 game recording")
+        moves = data[HEADER.size:HEADER.size + count]
+        start = HEADER.size + count
+        pieces = rows = None
+        if flags & FLAG_PIECES:
+            pieces = [PIECE_TYPES[i] for i in data[start:start + count]]
+            start += count
+        if flags & FLAG_ROWS:
+            rows = list(data[start:start + count])
+        return cls(seed, wid, [(move >> 4, move & 0xF) for move in moves], pieces, rows)
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'GameRecord':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayEngine:
+    """Rebuilds the position before any move of a recorded game.
+
+    Replaying keeps a snapshot every checkpoint_every moves, so a position
+    is restored from the nearest earlier snapshot and only the moves after
+    it are played again.
+    """
+
+    def __init__(self, record: GameRecord, checkpoint_every: int = 64):
+        self.record = record
+        self.checkpoint_every = checkpoint_every
+        self._checkpoints: Dict[int, tuple] = {0: self._snapshot(self._new_game())}
+
+    def __len__(self) -> int:
+        return len(self.record.moves)
+
+    def _new_game(self) -> BitboardGameState:
+        if self.record.pieces is None:
+            return BitboardGameState(seed=self.record.seed)
+        game = BitboardGameState()
+        if self.record.pieces:
+            game.next_piece_type = self.record.pieces[0]
+            game.current_piece = game._spawn_piece()
+        game.next_piece_type = self._piece(1)
+        return game
+
+    def _piece(self, index: int) -> Optional[str]:
+        pieces = self.record.pieces
+        return pieces[index] if index < len(pieces) else None
+
+    def _snapshot(self, game: BitboardGameState) -> tuple:
+        return (
+            list(game.rows), game.score, game.lines, game.level, game.game_over,
+            game.rng.getstate(), game.current_piece, game.next_piece_type
+        )
+
+    def _restore(self, snapshot: tuple) -> BitboardGameState:
+        game = BitboardGameState()
+        rows, game.score, game.lines, game.level, game.game_over, state, \
+            game.current_piece, game.next_piece_type = snapshot
+        game.set_rows(list(rows))
+        game.rng.setstate(state)
+        return game
+
+    def _step(self, game: BitboardGameState, index: int):
+        rotation, column = self.record.moves[index]
+        key = game.current_piece.key
+        if rotation >= len(PLACEMENT_TABLE[key]):
+            raise ReplayError(f"Move {index}: piece {key} has no rotation {rotation}")
+        info = PLACEMENT_TABLE[key][rotation]
+        if column + info.width > BOARD_WIDTH:
+            raise ReplayError(f"Move {index}: column {column} is off the board")
+        if self.record.rows is None:
+            y = landing_row(game.heights, info, column)
+            if y < 0:
+                raise ReplayError(f"Move {index}: piece {key} does not fit in column {column}")
+        else:
+            y = self.record.rows[index]
+            if not game.is_valid_position(Piece.at(key, rotation, column, y)):
+                raise ReplayError(f"Move {index}: piece {key} does not fit at column {column}, row {y}")
+
+        explicit = self.record.pieces is not None
+        if explicit and game.next_piece_type is None:
+            # Last recorded move, the piece after it was never seen
+            game.next_piece_type = key
+        game.lock_piece(Piece.at(key, rotation, column, y))
+        if explicit:
+            game.next_piece_type = self._piece(index + 2)
+
+    def position(self, move: int) -> BitboardGameState:
+        """Game state before the given move (len(self) for the final state)"""
+        if not 0 <= move <= len(self):
+            raise IndexError(move)
+        start = max(i for i in self._checkpoints if i <= move)
+        game = self._restore(self._checkpoints[start])
+        for index in range(start, move):
+            self._step(game, index)
+            if (index + 1) % self.checkpoint_every == 0:
+                self._checkpoints.setdefault(index + 1, self._snapshot(game))
+        return game
+
+    def positions(self) -> Iterator[Tuple[BitboardGameState, int, int]]:
+        """(state, rotation, column) before every move; the state is reused between moves"""
+        game = self._restore(self._checkpoints[0])
+        for index, (rotation, column) in enumerate(self.record.moves):
+            yield game, rotation, column
+            self._step(game, index)
+            if (index + 1) % self.checkpoint_every == 0:
+                self._checkpoints.setdefault(index + 1, self._snapshot(game))
+
+
+def record_positions(record: GameRecord, game: int = 0) -> np.ndarray:
+    """Every position of a recorded game as POSITION_DTYPE records"""
+    positions = np.zeros(len(record.moves), dtype=POSITION_DTYPE)
+    for index, (state, rotation, column) in enumerate(ReplayEngine(record).positions()):
+        position = positions[index]
+        position['rows'] = state.rows
+        position['piece'] = PIECE_INDEX[state.current_piece.key]
+        next_piece = state.next_piece_type
+        position['next_piece'] = UNKNOWN_PIECE if next_piece is None else PIECE_INDEX[next_piece]
+        position['move'] = rotation << 4 | column
+        position['move_index'] = index
+        position['game'] = game
+    return positions
+
+
+def append_positions(path: str, record: GameRecord, game: int = 0) -> int:
+    """Append a recorded game's positions to a dataset file, return how many"""
+    positions = record_positions(record, game)
+    with open(path, 'ab') as f:
+        f.write(positions.tobytes())
+    return len(positions)
+
+
+def load_positions(path: str) -> np.ndarray:
+    """Memory-mapped, read-only view of a position dataset"""
+    return np.memmap(path, dtype=POSITION_DTYPE, mode='r')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect Tetris game recordings")
+    parser.add_argument('recordings', nargs='+', help="recorded .trpl files")
+    parser.add_argument('--move', type=int, help="print the board before this move")
+    parser.add_argument('--dataset', help="append every position to this dataset file")
+    args = parser.parse_args()
+
+    total = 0
+    for game, path in enumerate(args.recordings):
+        record = GameRecord.load(path)
+        if args.dataset:
+            total += append_positions(args.dataset, record, game)
+            continue
+
+        engine = ReplayEngine(record)
+        final = engine.position(len(engine))
+        print(f"{path}: seed {record.seed}, weights {record.weights_id.hex()}, "
+              f"{len(engine)} moves, {final.lines} lines, score {final.score}")
+        if args.move is not None:
+            state = engine.position(args.move)
+            print(f"Before move {args.move} ({state.current_piece.key}):")
+            for row in state.board:
+                print(''.join('#' if cell else '.' for cell in row))
+
+    if args.dataset:
+        print(f"Appended {total} positions to {args.dataset}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Run AI searches off the asyncio event loop"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class SearchPool:
+    """Worker threads for AI searches with a bounded number of running jobs.
+
+    run() waits for a free slot before submitting, so when every slot is
+    busy callers are held back (backpressure) instead of piling work onto
+    the executor queue.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-search")
+        self.max_pending = max_pending
+        self.pending = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        async with self.slots:
+            return await self.submit(func, *args, **kwargs)
+
+    async def submit(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func on a worker thread, the caller must already hold a slot"""
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LatestWins:
+    """Single-slot mailbox: a newer message replaces one not yet taken"""
+
+    def __init__(self):
+        self._item = None
+        self._closed = False
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, item: Any):
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    def has_item(self) -> bool:
+        return self._item is not None
+
+    def take(self) -> Any:
+        item, self._item = self._item, None
+        self._event.clear()
+        return item
+
+    async def get(self) -> Optional[Any]:
+        """Next message, or None once closed and drained"""
+        while self._item is None:
+            if self._closed:
+                return None
+            await self._event.wait()
+            if self._item is None:
+                self._event.clear()
+        return self.take()
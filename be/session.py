@@ -0,0 +1,133 @@
+"""Server-side game state for the /ai-session websocket.
+
+A session keeps one game per connection so the client only sends what
+changed since the previous message:
+
+    {"op": "sync", "board": [[...]], "current_piece": {...},
+     "next_piece_type": "T", "score": 0, "lines": 0, "level": 1}
+        Replace the whole state (first message and after a resync).
+
+    {"op": "place", "rotation": 1, "x": 4, "y": 17, "next_piece_type": "S"}
+        Lock the current piece there and clear lines. The piece must fit
+        and rest on the stack or floor, otherwise the session resyncs. The
+        announced next piece becomes current and next_piece_type is the
+        newly drawn one (null when the client doesn't show it).
+
+    {"op": "piece", "current_piece": {...}, "next_piece_type": "S"}
+        Change the pieces without touching the board (hold, new game, ...).
+
+Any message may carry "hash", the client's board_hash() of its board after
+the change. When it differs from the server's board the session answers
+{"resync": true} and ignores deltas until the next sync.
+
+With an on_record callback, games synced from an empty board are recorded
+as replay GameRecords and handed over when the game ends, the board is
+resynced or the session closes. Recordings keep the landing row of every
+move, so placements that aren't hard drops replay too.
+"""
+
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from game_engine import (
+    BitboardGameState, GameState, Piece, TETROMINOS, board_hash
+)
+from replay import GameRecord
+
+
+class SessionError(Exception):
+    pass
+
+
+class GameSession:
+    """One connection's game, updated in place from client deltas"""
+
+    def __init__(self, on_record: Optional[Callable[[GameRecord], None]] = None, weights_id: bytes = bytes(8)):
+        self.game: Optional[GameState] = None
+        self.synced = False
+        self.on_record = on_record
+        self.weights_id = weights_id
+        self.record: Optional[GameRecord] = None
+
+    @property
+    def hash(self) -> Optional[int]:
+        return board_hash(self.game.rows) if self.game is not None else None
+
+    def apply(self, data: Dict) -> bool:
+        """Apply one client message, return False when a resync is needed"""
+        op = data.get('op', 'sync')
+        if op == 'sync':
+            self._sync(data)
+        elif not self.synced:
+            return False
+        elif op == 'place':
+            if not self._place(data):
+                self._desync()
+                return False
+        elif op == 'piece':
+            self._set_pieces(data)
+        else:
+            raise SessionError(f"Unknown op: {op}")
+
+        if 'hash' in data and int(data['hash']) != self.hash:
+            self._desync()
+            return False
+        return True
+
+    def _desync(self):
+        self.synced = False
+        self.close()
+
+    def close(self):
+        """Hand over the game being recorded, if any"""
+        record, self.record = self.record, None
+        if record is not None and record.moves:
+            self.on_record(record)
+
+    def _sync(self, data: Dict):
+        self.close()
+        if self.game is None:
+            self.game = BitboardGameState()
+        game = self.game
+        game.board = np.array(data['board'], dtype=int)
+        game.score = data.get('score', 0)
+        game.lines = data.get('lines', 0)
+        game.level = data.get('level', 1)
+        game.game_over = False
+        self._set_pieces(data)
+        self.synced = True
+        if self.on_record is not None and not any(game.rows) and not game.score:
+            self.record = GameRecord(0, self.weights_id, pieces=[], rows=[])
+
+    def _set_pieces(self, data: Dict):
+        if 'current_piece' in data:
+            piece_data = data['current_piece']
+            self.game.current_piece = Piece.at(
+                piece_data['type'],
+                piece_data['rotation'],
+                piece_data['x'],
+                piece_data['y']
+            )
+        # Unknown next piece is averaged over all piece types
+        self.game.next_piece_type = data.get('next_piece_type')
+
+    def _place(self, data: Dict) -> bool:
+        game = self.game
+        if game.next_piece_type is None:
+            # The client never told us which piece comes next
+            return False
+        key = game.current_piece.key
+        if not 0 <= data['rotation'] < len(TETROMINOS[key]):
+            return False
+        piece = Piece.at(key, data['rotation'], data['x'], data['y'])
+        # Must fit and rest on the stack or floor, not float mid-air
+        if not game.is_valid_position(piece) or game.is_valid_position(piece.move(0, 1)):
+            return False
+        if self.record is not None:
+            self.record.add(piece)
+        game.lock_piece(piece)
+        game.next_piece_type = data.get('next_piece_type')
+        if game.game_over:
+            self.close()
+        return True
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend modules are flat files in be/, imported as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+"""Contour index lookups against the AI's full depth-1 search"""
+
+import numpy as np
+import pytest
+
+from ai_engine import TetrisAI
+from contour_index import ContourIndex, save_index
+from game_engine import BOARD_HEIGHT, BOARD_WIDTH, GameState, Piece, PIECE_TYPES
+
+CLIP = 1
+
+
+@pytest.fixture(scope="module")
+def ai(tmp_path_factory):
+    ai = TetrisAI(cache_size=0)
+    path = tmp_path_factory.mktemp("index") / "weights.cix"
+    save_index(str(path), ai.weights, clip=CLIP)
+    ai.set_contour_index(ContourIndex(str(path)))
+    assert ai.contour_index_active
+    return ai
+
+
+def hole_free_board(rng: np.random.Generator) -> np.ndarray:
+    """Filled columns whose neighbouring heights differ by at most CLIP.
+
+    The lowest column stays empty, so the board has no full rows.
+    """
+    steps = rng.integers(-CLIP, CLIP + 1, BOARD_WIDTH - 1)
+    heights = np.concatenate([[0], np.cumsum(steps)])
+    heights -= heights.min()
+    board = np.zeros((BOARD_HEIGHT, BOARD_WIDTH), dtype=np.int8)
+    for x, height in enumerate(heights):
+        if height:
+            board[-height:, x] = 1
+    return board
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_lookup_matches_search(ai, seed):
+    rng = np.random.default_rng(seed)
+    game = GameState(seed=seed)
+    hits = 0
+    for _ in range(20):
+        game.board = hole_free_board(rng)
+        for key in PIECE_TYPES:
+            game.current_piece = Piece.at(key, 0, 3, 0)
+            found = ai.contour_index.lookup(game)
+            if found is None:
+                continue
+            hits += 1
+            placements = ai.evaluate_placements(game)
+            scores = {(p['rotation'], p['column']): p['score'] for p in placements}
+            # Ties may go either way, the score must be the best one
+            assert scores[found] == pytest.approx(max(scores.values()))
+    assert hits
@@ -0,0 +1,61 @@
+"""reachable_placements against a plain breadth-first search of the moves"""
+
+from collections import deque
+
+import numpy as np
+import pytest
+
+from game_engine import (
+    BOARD_HEIGHT, BOARD_WIDTH, GameState, Piece, PIECE_TYPES, ROTATION_KICKS, TETROMINOS,
+    column_masks, reachable_placements
+)
+
+
+def random_board(rng: np.random.Generator) -> np.ndarray:
+    """A ragged stack with holes and overhangs, no full rows"""
+    board = np.zeros((BOARD_HEIGHT, BOARD_WIDTH), dtype=np.int8)
+    height = int(rng.integers(0, 12))
+    if height:
+        board[-height:] = rng.random((height, BOARD_WIDTH)) < rng.uniform(0.3, 0.8)
+    for y in range(BOARD_HEIGHT):
+        if board[y].all():
+            board[y, rng.integers(BOARD_WIDTH)] = 0
+    return board
+
+
+def bfs_placements(game: GameState, key: str) -> set:
+    """Resting positions reached from every top-row spawn by left, right,
+    down and clockwise rotation with the first fitting kick"""
+    rotations = len(TETROMINOS[key])
+    queue = deque(
+        (r, x, 0) for r in range(rotations) for x in range(BOARD_WIDTH)
+        if game.is_valid_position(Piece(key, r, x, 0))
+    )
+    seen = set(queue)
+    while queue:
+        r, x, y = queue.popleft()
+        moves = [(r, x - 1, y), (r, x + 1, y), (r, x, y + 1)]
+        if rotations > 1:
+            turned = (r + 1) % rotations
+            for dx, dy in ROTATION_KICKS:
+                if game.is_valid_position(Piece(key, turned, x + dx, y + dy)):
+                    moves.append((turned, x + dx, y + dy))
+                    break
+        for position in moves:
+            if position not in seen and game.is_valid_position(Piece(key, *position)):
+                seen.add(position)
+                queue.append(position)
+    return {
+        (r, x, y) for r, x, y in seen
+        if not game.is_valid_position(Piece(key, r, x, y + 1))
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_bfs(seed):
+    rng = np.random.default_rng(seed)
+    game = GameState(seed=seed)
+    game.board = random_board(rng)
+    columns = column_masks(game.board)
+    for key in PIECE_TYPES:
+        assert set(reachable_placements(columns, key)) == bfs_placements(game, key)
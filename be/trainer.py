@@ -1,19 +1,48 @@
 """Training system for Tetris AI using Genetic Algorithm"""
 
 import numpy as np
+import os
 import random
-from game_engine import GameState, Piece
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from game_engine import ENGINES, Piece, weights_id
 from ai_engine import TetrisAI
+from batch_sim import BatchSimulator
+from replay import GameRecord
+
+
+def evaluate_weights(
+    weights: np.ndarray,
+    episodes: int = 3,
+    max_moves: int = 800,
+    engine: str = 'bitboard',
+    seeds: Optional[List[int]] = None,
+    recorder: Optional[Callable[[GameRecord], None]] = None,
+    move_generator: str = 'drop'
+) -> float:
+    """Evaluate weights by playing multiple games.
+
+    When seeds are given, one game is played per seed (and episodes is
+    ignored), so different weights can be scored on the same piece sequences.
+    recorder, if given, receives a GameRecord of every finished game.
+    move_generator picks the AI's move generator, see ai_engine.MOVE_GENERATORS.
+    """
+    if seeds is None:
+        seeds = [random.randint(0, 1000000) for _ in range(episodes)]
 
-
-def evaluate_weights(weights: np.ndarray, episodes: int = 3, max_moves: int = 800) -> float:
-    """Evaluate weights by playing multiple games"""
     total_lines = 0
+    game_cls = ENGINES[engine]
+    ai = TetrisAI(weights, cache_size=0, move_generator=move_generator)
+    wid = weights_id(ai.weights) if recorder else None
 
-    for _ in range(episodes):
-        game = GameState(seed=random.randint(0, 1000000))
-        ai = TetrisAI(weights)
+    for seed in seeds:
+        game = game_cls(seed=seed)
         moves = 0
+        record = None
+        if recorder:
+            # Tucks and spins can't be replayed as hard drops, keep their rows
+            record = GameRecord(seed, wid, rows=None if move_generator == 'drop' else [])
 
         while not game.game_over and moves < max_moves:
             best_move = ai.get_best_move(game)
@@ -21,125 +50,588 @@ def evaluate_weights(weights: np.ndarray, episodes: int = 3, max_moves: int = 80
             if not best_move:
                 break
 
-            # Create piece with best move rotation and column
-            rotation = best_move['rotation']
-            column = best_move['column']
-
-            # Create new piece at target position
-            piece = Piece(game.current_piece.key, rotation, column, 0)
-
-            # Drop piece to final position
-            while game.is_valid_position(piece.move(0, 1)):
-                piece = piece.move(0, 1)
-
-            if not game.is_valid_position(piece):
-                break
+            # Piece at the landing position found by the AI
+            piece = Piece.at(
+                game.current_piece.key,
+                best_move['rotation'],
+                best_move['column'],
+                best_move['final_y']
+            )
 
             # Lock piece
             game.lock_piece(piece)
             moves += 1
+            if record is not None:
+                record.add(piece)
 
         total_lines += game.lines
+        if record is not None:
+            recorder(record)
+
+    return total_lines / len(seeds)
+
+
+def record_games(
+    weights: np.ndarray,
+    seeds: List[int],
+    max_moves: int,
+    directory: str,
+    prefix: str
+) -> List[str]:
+    """Play weights on the given seeds and save every game as a recording"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+
+    def save(record: GameRecord):
+        path = os.path.join(directory, f"{prefix}-seed{record.seed}.trpl")
+        record.save(path)
+        paths.append(path)
+
+    evaluate_weights(weights, max_moves=max_moves, seeds=seeds, recorder=save)
+    return paths
+
+
+def evaluate_population_batched(
+    population: List[np.ndarray],
+    seeds: List[int],
+    max_moves: int = 800
+) -> List[float]:
+    """Score every individual on the same games with one lockstep simulation"""
+    weights = np.repeat(np.asarray(population, dtype=float), len(seeds), axis=0)
+    lines = BatchSimulator(list(seeds) * len(population), weights).run(max_moves)
+    return lines.reshape(len(population), len(seeds)).mean(axis=1).tolist()
+
+
+def evaluate_population(
+    population: List[np.ndarray],
+    seeds: List[int],
+    max_moves: int = 800,
+    executor: Optional[Executor] = None,
+    on_result: Optional[Callable[[int, float], None]] = None,
+    batched: bool = False,
+    chunks: int = 1
+) -> List[float]:
+    """Score every individual on the same games.
+
+    Individuals are spread over the executor's workers when one is given.
+    With batched=True the games run in lockstep through BatchSimulator, one
+    simulation per chunk of the population. on_result(index, score) is
+    called as each individual finishes.
+    """
+    scores = [0.0] * len(population)
+
+    if batched:
+        size = -(-len(population) // max(chunks, 1))
+        starts = range(0, len(population), size)
+        if executor is None:
+            results = (
+                (start, evaluate_population_batched(population[start:start + size], seeds, max_moves))
+                for start in starts
+            )
+        else:
+            futures = {
+                executor.submit(evaluate_population_batched, population[start:start + size], seeds, max_moves): start
+                for start in starts
+            }
+            results = ((futures[future], future.result()) for future in as_completed(futures))
+
+        for start, chunk_scores in results:
+            for offset, score in enumerate(chunk_scores):
+                scores[start + offset] = score
+                if on_result:
+                    on_result(start + offset, score)
+        return scores
+
+    if executor is None:
+        for idx, weights in enumerate(population):
+            scores[idx] = evaluate_weights(weights, max_moves=max_moves, seeds=seeds)
+            if on_result:
+                on_result(idx, scores[idx])
+        return scores
+
+    futures = {
+        executor.submit(evaluate_weights, weights, max_moves=max_moves, seeds=seeds): idx
+        for idx, weights in enumerate(population)
+    }
+    for future in as_completed(futures):
+        idx = futures[future]
+        scores[idx] = future.result()
+        if on_result:
+            on_result(idx, scores[idx])
+    return scores
+
+
+class FitnessCache:
+    """Fitness of fully evaluated weight vectors, reused across generations"""
+
+    def __init__(self):
+        self._scores = {}
+        self.hits = 0
+
+    def _key(self, weights: np.ndarray) -> bytes:
+        return np.asarray(weights, dtype=float).tobytes()
+
+    def get(self, weights: np.ndarray) -> Optional[float]:
+        score = self._scores.get(self._key(weights))
+        if score is not None:
+            self.hits += 1
+        return score
+
+    def put(self, weights: np.ndarray, score: float):
+        self._scores[self._key(weights)] = score
+
+
+def racing_schedule(
+    n: int,
+    budget: int,
+    max_moves: int,
+    eta: int = 2,
+    min_survivors: int = 1
+) -> List[Tuple[int, int, int]]:
+    """Successive halving plan as (survivors, episodes, max_moves) per stage.
+
+    Every stage keeps the best 1/eta of the previous one until min_survivors
+    remain. The budget (games per generation) is split evenly over stages,
+    so survivors get more games each, and early stages play shorter games.
+    """
+    survivors = [n]
+    while survivors[-1] > min_survivors and -(-survivors[-1] // eta) >= min_survivors:
+        survivors.append(-(-survivors[-1] // eta))
+
+    stages = len(survivors)
+    per_stage = budget / stages
+    return [
+        (
+            count,
+            max(1, int(per_stage // count)),
+            max(max_moves // eta ** (stages - 1 - stage), min(100, max_moves))
+        )
+        for stage, count in enumerate(survivors)
+    ]
+
+
+def race_population(
+    population: List[np.ndarray],
+    budget: int,
+    max_moves: int,
+    rng: np.random.Generator,
+    executor: Optional[Executor] = None,
+    eta: int = 2,
+    min_survivors: int = 1,
+    on_stage: Optional[Callable[[Dict], None]] = None,
+    batched: bool = False,
+    chunks: int = 1
+) -> Tuple[List[float], List[int]]:
+    """Evaluate a population with successive halving.
+
+    All individuals play a few short games, the bottom of each stage is
+    dropped and the survivors play further, longer games. Returns each
+    individual's mean lines over the games it played and the last stage it
+    reached, so pruned individuals can be ranked below survivors.
+    on_stage receives a summary after every stage and after every
+    individual's games in a stage, with 'member' its index in population.
+    """
+    schedule = racing_schedule(len(population), budget, max_moves, eta, min_survivors)
+    total_games = sum(count * episodes for count, episodes, _ in schedule)
+    lines = np.zeros(len(population))
+    games = np.zeros(len(population), dtype=int)
+    stage_reached = [0] * len(population)
+    alive = list(range(len(population)))
+    played = 0
+
+    for stage, (count, episodes, moves) in enumerate(schedule):
+        if stage > 0:
+            # Keep the best survivors of the previous stage
+            alive.sort(key=lambda i: lines[i] / games[i], reverse=True)
+            pruned, alive = alive[count:], alive[:count]
+            if on_stage:
+                on_stage({
+                    'stage': stage + 1,
+                    'stages': len(schedule),
+                    'survivors': len(alive),
+                    'pruned': len(pruned),
+                    'games_played': played,
+                    'games_budget': total_games
+                })
+
+        seeds = [int(s) for s in rng.integers(0, 1000000, size=episodes)]
+        members = [population[i] for i in alive]
+
+        def on_result(idx, score, stage=stage):
+            nonlocal played
+            played += episodes
+            if on_stage:
+                on_stage({
+                    'stage': stage + 1,
+                    'stages': len(schedule),
+                    'survivors': len(alive),
+                    'member': alive[idx],
+                    'score': score,
+                    'games_played': played,
+                    'games_budget': total_games
+                })
+
+        results = evaluate_population(
+            members, seeds, moves, executor, on_result,
+            batched=batched, chunks=chunks
+        )
+        for i, score in zip(alive, results):
+            lines[i] += score * episodes
+            games[i] += episodes
+            stage_reached[i] = stage
 
-    return total_lines / episodes
+    return (lines / np.maximum(games, 1)).tolist(), stage_reached
 
 
-def random_weights() -> np.ndarray:
+def random_weights(rng: Optional[np.random.Generator] = None) -> np.ndarray:
     """Generate random weights"""
-    return np.random.uniform(-1, 1, size=4)
+    rng = rng or np.random.default_rng()
+    return rng.uniform(-1, 1, size=4)
 
 
-def mutate(weights: np.ndarray, rate: float = 0.25, scale: float = 0.3) -> np.ndarray:
+def mutate(
+    weights: np.ndarray,
+    rate: float = 0.25,
+    scale: float = 0.3,
+    rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
     """Mutate weights"""
+    rng = rng or np.random.default_rng()
     mutated = weights.copy()
     for i in range(len(mutated)):
-        if random.random() < rate:
-            mutated[i] += np.random.normal(0, scale)
+        if rng.random() < rate:
+            mutated[i] += rng.normal(0, scale)
     return mutated
 
 
-def crossover(parent1: np.ndarray, parent2: np.ndarray) -> np.ndarray:
+def crossover(
+    parent1: np.ndarray,
+    parent2: np.ndarray,
+    rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
     """Crossover two parent weights"""
+    rng = rng or np.random.default_rng()
     child = np.zeros_like(parent1)
     for i in range(len(child)):
-        child[i] = parent1[i] if random.random() < 0.5 else parent2[i]
+        child[i] = parent1[i] if rng.random() < 0.5 else parent2[i]
     return child
 
 
-def train_genetic_algorithm(
-    generations: int = 30,
-    population_size: int = 40,
-    callback=None
-) -> tuple:
-    """Train AI using genetic algorithm"""
+class Optimizer(ABC):
+    """Ask/tell interface for weight search strategies.
 
-    print(f"🧬 Starting Genetic Algorithm Training")
-    print(f"📊 Generations: {generations}, Population: {population_size}")
-    print("=" * 60)
+    ask() returns the weight vectors to evaluate next; tell() receives them
+    back with their fitness and the racing stage they reached (higher stages
+    rank first, fitness breaks ties).
+    """
 
-    # Initialize population
-    population = [random_weights() for _ in range(population_size)]
-    best_weights = None
-    best_score = 0
+    name = 'optimizer'
 
-    for gen in range(generations):
-        # Evaluate population
-        scores = []
-        current_gen_best = 0
+    @abstractmethod
+    def ask(self) -> List[np.ndarray]:
+        pass
 
-        for idx, weights in enumerate(population):
-            score = evaluate_weights(weights)
-            scores.append((score, weights))
-
-            if score > current_gen_best:
-                current_gen_best = score
-
-            # Calculate progress per individual
-            total_steps = generations * population_size
-            current_step = (gen * population_size) + (idx + 1)
-            progress = (current_step / total_steps) * 100
-
-            print(f"Gen {gen+1}/{generations} - Individual {idx+1}/{population_size}: {score:.2f} lines", end='\r')
-
-            if callback:
-                callback({
-                    'generation': gen + 1,
-                    'individual': idx + 1,
-                    'population_size': population_size,
-                    'best_score': current_gen_best,
-                    'overall_best': max(best_score, current_gen_best),
-                    'progress': progress
-                })
+    @abstractmethod
+    def tell(self, population: List[np.ndarray], fitness: List[float], stages: List[int]):
+        pass
 
-        scores.sort(key=lambda x: x[0], reverse=True)
 
-        # Update best
-        if scores[0][0] > best_score:
-            best_score = scores[0][0]
-            best_weights = scores[0][1].copy()
+def _ranking(fitness: List[float], stages: List[int]) -> List[int]:
+    """Indices from best to worst"""
+    return sorted(range(len(fitness)), key=lambda i: (stages[i], fitness[i]), reverse=True)
 
-        print(f"\nGen {gen+1}/{generations}: Best={scores[0][0]:.2f}, Overall Best={best_score:.2f}")
+
+class GeneticOptimizer(Optimizer):
+    """Elitist genetic algorithm with uniform crossover and gaussian mutation"""
+
+    name = 'Genetic Algorithm'
+
+    def __init__(self, population_size: int, rng: np.random.Generator):
+        self.population_size = population_size
+        self.rng = rng
+        self.population = [random_weights(rng) for _ in range(population_size)]
+
+    def ask(self) -> List[np.ndarray]:
+        return self.population
+
+    def tell(self, population: List[np.ndarray], fitness: List[float], stages: List[int]):
+        rng = self.rng
 
         # Select top performers
-        elite_size = population_size // 5
-        elite = [w for _, w in scores[:elite_size]]
+        elite_size = self.population_size // 5
+        elite = [population[i] for i in _ranking(fitness, stages)[:elite_size]]
 
         # Create new population
         new_population = [elite[0]]  # Keep best
 
-        while len(new_population) < population_size:
-            if random.random() < 0.7 and len(elite) >= 2:
+        while len(new_population) < self.population_size:
+            if rng.random() < 0.7 and len(elite) >= 2:
                 # Crossover
-                parent1 = random.choice(elite)
-                parent2 = random.choice(elite)
-                child = crossover(parent1, parent2)
-                new_population.append(mutate(child, 0.2, 0.2))
+                parent1 = elite[rng.integers(len(elite))]
+                parent2 = elite[rng.integers(len(elite))]
+                child = crossover(parent1, parent2, rng)
+                new_population.append(mutate(child, 0.2, 0.2, rng))
             else:
                 # Mutation only
-                parent = random.choice(elite)
-                new_population.append(mutate(parent))
+                parent = elite[rng.integers(len(elite))]
+                new_population.append(mutate(parent, rng=rng))
+
+        self.population = new_population
+
+
+class CMAESOptimizer(Optimizer):
+    """Covariance matrix adaptation evolution strategy.
+
+    Samples a population from a multivariate normal around the current mean
+    and adapts the mean, step size and covariance from the best half, which
+    needs far fewer evaluations than the GA on a low-dimensional problem.
+    """
+
+    name = 'CMA-ES'
+
+    def __init__(
+        self,
+        population_size: int,
+        rng: np.random.Generator,
+        dim: int = 4,
+        sigma: float = 0.5,
+        mean: Optional[np.ndarray] = None
+    ):
+        self.rng = rng
+        self.dim = n = dim
+        self.lam = max(population_size, 4)
+        self.mu = self.lam // 2
+        self.sigma = sigma
+        self.mean = np.zeros(n) if mean is None else np.array(mean, dtype=float)
+
+        # Recombination weights and learning rates (Hansen's defaults)
+        w = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.w = w / w.sum()
+        self.mueff = 1 / np.sum(self.w ** 2)
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0, np.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.B = np.eye(n)
+        self.D = np.ones(n)
+        self.C = np.eye(n)
+        self.generation = 0
+        self._steps = None
+
+    def ask(self) -> List[np.ndarray]:
+        z = self.rng.standard_normal((self.lam, self.dim))
+        self._steps = (z * self.D) @ self.B.T
+        return list(self.mean + self.sigma * self._steps)
+
+    def tell(self, population: List[np.ndarray], fitness: List[float], stages: List[int]):
+        n = self.dim
+        self.generation += 1
+        selected = self._steps[_ranking(fitness, stages)[:self.mu]]
+        step = self.w @ selected
+        self.mean = self.mean + self.sigma * step
+
+        # Evolution paths
+        inv_sqrt_c = self.B @ np.diag(1 / self.D) @ self.B.T
+        self.ps = (1 - self.cs) * self.ps + np.sqrt(self.cs * (2 - self.cs) * self.mueff) * (inv_sqrt_c @ step)
+        ps_norm = np.linalg.norm(self.ps)
+        hsig = ps_norm / np.sqrt(1 - (1 - self.cs) ** (2 * self.generation)) / self.chi_n < 1.4 + 2 / (n + 1)
+        self.pc = (1 - self.cc) * self.pc + hsig * np.sqrt(self.cc * (2 - self.cc) * self.mueff) * step
+
+        # Covariance and step size
+        rank_mu = (selected.T * self.w) @ selected
+        self.C = (
+            (1 - self.c1 - self.cmu) * self.C
+            + self.c1 * (np.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C)
+            + self.cmu * rank_mu
+        )
+        self.sigma *= np.exp((self.cs / self.damps) * (ps_norm / self.chi_n - 1))
+
+        self.C = (self.C + self.C.T) / 2
+        eigenvalues, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+
+OPTIMIZERS = {
+    'ga': GeneticOptimizer,
+    'cmaes': CMAESOptimizer,
+}
+
+
+def _pool_processes(executor: ProcessPoolExecutor) -> List:
+    """The pool's worker processes; they are private to the executor, so
+    none when that changes and shutdown has to wait for them instead"""
+    processes = getattr(executor, '_processes', None)
+    return list(processes.values()) if isinstance(processes, dict) else []
+
+
+def train_weights(
+    generations: int = 30,
+    population_size: int = 40,
+    callback=None,
+    optimizer: str = 'ga',
+    episodes: int = 3,
+    max_moves: int = 800,
+    workers: Optional[int] = 1,
+    seed: Optional[int] = None,
+    batched: bool = False,
+    budget: Optional[int] = None,
+    record_dir: Optional[str] = None
+) -> tuple:
+    """Train AI weights with a pluggable optimizer ('ga' or 'cmaes').
+
+    workers > 1 (or None for one per CPU) evaluates individuals in a process
+    pool. batched=True plays each worker's games in lockstep with
+    BatchSimulator instead of one at a time. With a budget (games per
+    generation) individuals are raced by successive halving instead of all
+    playing `episodes` full games. Weight vectors carried over unchanged keep
+    their fitness from earlier generations. All randomness comes from the
+    master seed and every individual of a generation plays the same seeded
+    games, so a given seed gives the same result whatever the worker count.
+    With record_dir, each generation's best individual has its games saved
+    there as replay recordings.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    rng = np.random.default_rng(seed)
+    strategy = OPTIMIZERS[optimizer](population_size, rng)
+
+    print(f"🧬 Starting {strategy.name} Training")
+    print(f"📊 Generations: {generations}, Population: {population_size}, Workers: {workers}")
+    print("=" * 60)
 
-        population = new_population
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    fitness_cache = FitnessCache()
+    best_weights = None
+    best_score = 0
+    games_total = 0
+    individuals_total = 0
+
+    try:
+        for gen in range(generations):
+            population = strategy.ask()
+            population_size = len(population)
+            current_gen_best = 0
+            completed = 0
+            stage_games = 0
+
+            def report(stats):
+                if callback:
+                    callback({
+                        'generation': gen + 1,
+                        'population_size': population_size,
+                        'best_score': current_gen_best,
+                        'overall_best': max(best_score, current_gen_best),
+                        'games_total': games_total,
+                        'individuals_total': individuals_total,
+                        **stats
+                    })
+
+            def on_result(idx, score, games=0):
+                nonlocal current_gen_best, completed, games_total, individuals_total
+                completed += 1
+                individuals_total += 1
+                games_total += games
+                current_gen_best = max(current_gen_best, score)
+
+                # Calculate progress per individual
+                total_steps = generations * population_size
+                current_step = (gen * population_size) + completed
+                progress = (current_step / total_steps) * 100
+
+                print(f"Gen {gen+1}/{generations} - Individual {completed}/{population_size}: {score:.2f} lines", end='\r')
+                report({'individual': completed, 'progress': progress})
+
+            def on_stage(stats):
+                nonlocal current_gen_best, games_total, stage_games, individuals_total
+                games_total += stats['games_played'] - stage_games
+                stage_games = stats['games_played']
+                # An individual is done when pruned or after the last stage
+                individuals_total += stats.get('pruned', 0)
+                if 'member' in stats:
+                    stats = {**stats, 'individual': pending[stats.pop('member')] + 1}
+                    current_gen_best = max(current_gen_best, stats['score'])
+                    if stats['stage'] == stats['stages']:
+                        individuals_total += 1
+                fraction = stats['games_played'] / stats['games_budget']
+                progress = (gen + fraction) / generations * 100
+                if 'pruned' in stats:
+                    print(f"\nGen {gen+1}/{generations} - Stage {stats['stage']}/{stats['stages']}: "
+                          f"pruned {stats['pruned']}, {stats['survivors']} left")
+                report({**stats, 'progress': progress})
+
+            # Reuse fitness of unchanged weight vectors
+            fitness = [fitness_cache.get(w) for w in population]
+            stages = [None] * population_size
+            pending = [i for i, score in enumerate(fitness) if score is None]
+            for i, score in enumerate(fitness):
+                if score is not None:
+                    on_result(i, score)
+
+            # Evaluate the rest of the population
+            members = [population[i] for i in pending]
+            if budget is None or not members:
+                # Shared games for this generation
+                game_seeds = [int(s) for s in rng.integers(0, 1000000, size=episodes)]
+                results = evaluate_population(
+                    members, game_seeds, max_moves, executor,
+                    lambda idx, score: on_result(pending[idx], score, len(game_seeds)),
+                    batched=batched, chunks=workers
+                )
+                reached = [0] * len(members)
+                last_stage = 0
+            else:
+                results, reached = race_population(
+                    members, budget, max_moves, rng, executor,
+                    min_survivors=max(1, population_size // 5),
+                    on_stage=on_stage, batched=batched, chunks=workers
+                )
+                last_stage = max(reached, default=0)
+                # Raced games are spread over many seeds, record on fresh ones
+                # without drawing from the training generator
+                record_rng = np.random.default_rng([gen] if seed is None else [seed, gen])
+                game_seeds = [int(s) for s in record_rng.integers(0, 1000000, size=episodes)]
+
+            for i, score, stage in zip(pending, results, reached):
+                fitness[i] = score
+                stages[i] = stage
+                if stage == last_stage:
+                    fitness_cache.put(population[i], score)
+
+            # Cached and fully raced individuals rank above pruned ones
+            rank = [last_stage if s is None else s for s in stages]
+
+            scores = [(fitness[i], population[i]) for i in _ranking(fitness, rank)]
+
+            # Update best
+            if scores[0][0] > best_score:
+                best_score = scores[0][0]
+                best_weights = scores[0][1].copy()
+
+            print(f"\nGen {gen+1}/{generations}: Best={scores[0][0]:.2f}, Overall Best={best_score:.2f}")
+            if record_dir:
+                record_games(scores[0][1], game_seeds, max_moves, record_dir, f"gen{gen + 1:03d}")
+
+            strategy.tell(population, fitness, rank)
+    except BaseException:
+        # Cancelled (SIGTERM from the job manager) or failed: drop the queued
+        # individuals and stop the running ones, which the process would
+        # otherwise wait for on exit
+        if executor is not None:
+            processes = _pool_processes(executor)
+            executor.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+        raise
+    else:
+        if executor is not None:
+            executor.shutdown()
 
     print("\n" + "=" * 60)
     print(f"✅ Training Complete!")
@@ -149,9 +641,19 @@ def train_genetic_algorithm(
     return best_weights, best_score
 
 
+def train_genetic_algorithm(
+    generations: int = 30,
+    population_size: int = 40,
+    callback=None,
+    **kwargs
+) -> tuple:
+    """Train AI using genetic algorithm"""
+    return train_weights(generations, population_size, callback, optimizer='ga', **kwargs)
+
+
 if __name__ == "__main__":
     print("Starting training...")
-    weights, score = train_genetic_algorithm(generations=3, population_size=20)
+    weights, score = train_genetic_algorithm(generations=3, population_size=20, workers=None)
     print(f"\n✅ Training complete!")
     print(f"Best score: {score:.2f} lines/game")
     print(f"Weights: {weights}")
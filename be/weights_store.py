@@ -0,0 +1,177 @@
+"""Versioned AI weights shared by every server worker through a memory-mapped file.
+
+With several uvicorn workers each process has its own TetrisAI. Weights
+are published to one small file that every worker maps; a worker polls
+the generation counter (a few bytes of shared memory) and swaps in new
+weights when it changes, so training in any worker reaches all of them
+without a restart.
+
+The generation is a seqlock: a writer makes it odd, writes the weights
+and makes it even again. A reader copies the weights between two reads of
+the generation and retries unless both are the same even number, so it
+never sees half-written weights. Writers are serialized by flock on the
+file. A writer that finds an odd generation holds the lock, so the writer
+that made it odd died mid-write: the torn record is replaced by an empty
+one. Readers give up after READ_RETRIES tries and keep their last good
+value instead of waiting for a writer that may never finish.
+
+A training run holds a second flock, on the file with ".training"
+appended, so only one worker trains at a time; the kernel drops it when
+that worker exits.
+
+File layout (little-endian):
+    magic "TWST", version u8, 3 pad bytes, generation u64,
+    published unix time f64, weight count u32, weights id 8 bytes,
+    MAX_WEIGHTS float64 weights
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+import numpy as np
+
+from game_engine import weights_id
+
+MAGIC = b"TWST"
+VERSION = 1
+MAX_WEIGHTS = 64
+HEADER = struct.Struct("<4sB3xQdI8s")
+GENERATION = struct.Struct("<Q")
+GENERATION_OFFSET = 8
+SIZE = HEADER.size + MAX_WEIGHTS * 8
+READ_RETRIES = 1000
+
+
+class WeightsStoreError(Exception):
+    pass
+
+
+class WeightsStore:
+    """One worker's view of the shared weights file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._locked():
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, SIZE)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, VERSION, 0, 0.0, 0, bytes(8)), 0)
+        self._map = mmap.mmap(self._fd, SIZE)
+        magic, version = HEADER.unpack_from(self._map)[:2]
+        if magic != MAGIC or version != VERSION:
+            raise WeightsStoreError(f"{path} is not a version {VERSION} weights store")
+        # Generation of the weights this worker last read
+        self.seen = 0
+        # Last consistent read, returned when a write never finishes
+        self._last: Tuple[int, Optional[np.ndarray], float] = (0, None, 0.0)
+        self._training_fd: Optional[int] = None
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @property
+    def generation(self) -> int:
+        return GENERATION.unpack_from(self._map, GENERATION_OFFSET)[0]
+
+    @property
+    def version(self) -> int:
+        """Number of times weights were published, 0 while empty"""
+        return self.seen // 2
+
+    def read(self) -> Tuple[int, Optional[np.ndarray], float]:
+        """Consistent (generation, weights, published time); weights is None while empty"""
+        for _ in range(READ_RETRIES):
+            before = self.generation
+            if before % 2 == 0:
+                _, _, _, published, count, _ = HEADER.unpack_from(self._map)
+                weights = np.frombuffer(self._map, dtype='<f8', count=count, offset=HEADER.size).copy()
+                if self.generation == before:
+                    self._last = (before, (weights if count else None), published)
+                    return self._last
+            time.sleep(0)
+        return self._last
+
+    def publish(self, weights: np.ndarray) -> int:
+        """Make weights the current version for every worker, return the new version"""
+        weights = np.asarray(weights, dtype='<f8').ravel()
+        if len(weights) > MAX_WEIGHTS:
+            raise WeightsStoreError(f"At most {MAX_WEIGHTS} weights fit in the store")
+        with self._locked():
+            self._recover()
+            return self._write(weights)
+
+    def _recover(self):
+        """With the lock held, replace a record left torn by a dead writer"""
+        generation = self.generation
+        if generation % 2:
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, generation, 0.0, 0, bytes(8))
+            GENERATION.pack_into(self._map, GENERATION_OFFSET, generation + 1)
+
+    def _write(self, weights: np.ndarray) -> int:
+        generation = self.generation
+        GENERATION.pack_into(self._map, GENERATION_OFFSET, generation + 1)
+        HEADER.pack_into(
+            self._map, 0, MAGIC, VERSION, generation + 1, time.time(), len(weights), weights_id(weights)
+        )
+        self._map[HEADER.size:HEADER.size + weights.nbytes] = weights.tobytes()
+        GENERATION.pack_into(self._map, GENERATION_OFFSET, generation + 2)
+        return (generation + 2) // 2
+
+    def initialize(self, weights: np.ndarray, source_mtime: float = 0.0) -> np.ndarray:
+        """Weights a starting worker should use.
+
+        The store keeps weights published while the server runs; weights
+        from a file modified after the last publish (or an empty store)
+        are published first. Every worker calls this, the first one wins.
+        """
+        with self._locked():
+            self._recover()
+            generation, current, published = self.read()
+            if current is None or source_mtime > published:
+                self._write(np.asarray(weights, dtype='<f8').ravel())
+            generation, current, _ = self.read()
+        self.seen = generation
+        return current
+
+    def poll(self) -> Optional[np.ndarray]:
+        """New weights if another worker published since the last read, else None"""
+        generation = self.generation
+        if generation == self.seen or generation % 2:
+            # Unchanged, or a write in progress: look again next time
+            return None
+        generation, weights, _ = self.read()
+        self.seen = generation
+        return weights
+
+    def claim_training(self) -> bool:
+        """Mark a training run in progress for every worker; True if this
+        worker holds (or already held) the claim, False while another does"""
+        if self._training_fd is None:
+            fd = os.open(self.path + ".training", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._training_fd = fd
+        return True
+
+    def release_training(self):
+        if self._training_fd is not None:
+            os.close(self._training_fd)
+            self._training_fd = None
+
+    def close(self):
+        self.release_training()
+        self._map.close()
+        os.close(self._fd)
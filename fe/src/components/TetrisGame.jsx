@@ -266,15 +266,18 @@ const TetrisGame = () => {
         x: aiMove.column
       }
 
-      if (!isValidPosition(board, piece, piece.x, piece.y)) {
+      // The server may answer with a tuck or spin that a straight drop can't reach
+      if (aiMove.final_y !== undefined && isValidPosition(board, piece, piece.x, aiMove.final_y)) {
+        piece.y = aiMove.final_y
+      } else if (!isValidPosition(board, piece, piece.x, piece.y)) {
         lockPieceDirectly(currentPiece)
         return
+      } else {
+        let y = piece.y
+        while (isValidPosition(board, piece, piece.x, y + 1)) y++
+        piece.y = y
       }
 
-      let y = piece.y
-      while (isValidPosition(board, piece, piece.x, y + 1)) y++
-      piece.y = y
-
       setCurrentPiece(piece)
 
       setTimeout(() => {